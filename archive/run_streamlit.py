@@ -4,20 +4,31 @@ E2B Streamlit Runner - MVP Demo
 Demonstrates how fast E2B sandbox can spin up a Streamlit app.
 
 Usage:
-    python run_streamlit.py <path_to_script.py> [--port PORT]
+    python run_streamlit.py <path_to_script.py> [--port PORT] [--no-template]
 
 Loads environment variables from .env file automatically.
 """
 
 import argparse
+import ast
+import asyncio
+import atexit
+import functools
+import io
+import json
 import os
+import subprocess
 import sys
+import tarfile
+import threading
 import time
 import webbrowser
 from pathlib import Path
 
+import httpx
 from dotenv import load_dotenv
-from e2b_code_interpreter import Sandbox
+from e2b import CommandExitException, NotFoundException, SandboxException
+from e2b_code_interpreter import AsyncSandbox
 
 # Load .env file from current directory or script directory
 load_dotenv()
@@ -25,6 +36,61 @@ load_dotenv()
 
 VERBOSE = False
 
+# Pre-built template with streamlit + common deps (see e2b-template/build_dev.py)
+DEFAULT_TEMPLATE = "keboola-streamlit-dev"
+TEMPLATE_DIR = Path(__file__).resolve().parent.parent / "e2b-template"
+
+# Packages pre-installed in the template venv; other detected deps are
+# installed at startup from the template's warm uv cache
+sys.path.insert(0, str(TEMPLATE_DIR))
+from template import STREAMLIT_PACKAGES  # noqa: E402
+TEMPLATE_PACKAGES = frozenset(STREAMLIT_PACKAGES)
+
+# Keys to forward to sandbox (loaded from .env)
+FORWARD_KEYS = frozenset({
+    "WORKSPACE_ID",
+    "BRANCH_ID",
+    "KBC_URL",
+    "KBC_TOKEN",
+    # Add more keys here as needed
+})
+
+# Common mapping of import names to pip packages
+IMPORT_TO_PIP = {
+    "streamlit": "streamlit",
+    "pandas": "pandas",
+    "plotly": "plotly",
+    "httpx": "httpx",
+    "numpy": "numpy",
+    "matplotlib": "matplotlib",
+    "seaborn": "seaborn",
+    "sklearn": "scikit-learn",
+    "scipy": "scipy",
+    "requests": "requests",
+    "altair": "altair",
+    "bokeh": "bokeh",
+    "pydantic": "pydantic",
+}
+KNOWN_IMPORTS = frozenset(IMPORT_TO_PIP)
+
+# On-disk cache of detected dependencies, keyed by script path + stat
+DEPS_CACHE_FILE = Path.home() / ".cache" / "e2b-runner" / "deps.json"
+
+# Remote locations for the bootstrap bundle (script + bootstrap.sh)
+REMOTE_DIR = "/home/user"
+BUNDLE_PATH = "/tmp/bootstrap.tgz"
+
+# uv cache pre-populated by the template (see e2b-template/template.py);
+# symlinking from it avoids copying wheels into site-packages
+UV_CACHE_DIR = "/home/user/.cache/uv"
+UV_INSTALL_FLAGS = f"--link-mode=symlink --cache-dir={UV_CACHE_DIR}"
+
+# Streamlit readiness probe (runs that install deps first wait longer)
+READY_POLL_INTERVAL = 0.1
+READY_TIMEOUT_TEMPLATE = 5.0
+READY_TIMEOUT_TEMPLATE_EXTRAS = 30.0
+READY_TIMEOUT_NO_TEMPLATE = 120.0
+
 
 def timestamp(start_time: float) -> str:
     """Return elapsed time since start."""
@@ -48,66 +114,210 @@ def debug(start_time: float, message: str):
 
 def get_sandbox_env_vars() -> dict[str, str]:
     """Get environment variables to pass to sandbox from .env file."""
-    # Keys to forward to sandbox (loaded from .env)
-    FORWARD_KEYS = [
-        "WORKSPACE_ID",
-        "BRANCH_ID",
-        "KBC_URL",
-        "KBC_TOKEN",
-        # Add more keys here as needed
-    ]
-
-    result = {}
-    for key in FORWARD_KEYS:
-        value = os.environ.get(key)
-        if value:
-            result[key] = value.strip()
-
-    return result
-
-
-def extract_dependencies(script_path: Path) -> list[str]:
-    """Extract likely pip dependencies from imports in the script."""
-    # Common mapping of import names to pip packages
-    IMPORT_TO_PIP = {
-        "streamlit": "streamlit",
-        "pandas": "pandas",
-        "plotly": "plotly",
-        "httpx": "httpx",
-        "numpy": "numpy",
-        "matplotlib": "matplotlib",
-        "seaborn": "seaborn",
-        "sklearn": "scikit-learn",
-        "scipy": "scipy",
-        "requests": "requests",
-        "altair": "altair",
-        "bokeh": "bokeh",
-        "pydantic": "pydantic",
+    return {
+        key: value.strip()
+        for key, value in os.environ.items()
+        if key in FORWARD_KEYS and value
     }
 
-    deps = set()
-    content = script_path.read_text()
 
-    for line in content.split("\n"):
-        line = line.strip()
-        if line.startswith("import ") or line.startswith("from "):
-            # Extract module name
-            if line.startswith("from "):
-                module = line.split()[1].split(".")[0]
-            else:
-                module = line.split()[1].split(".")[0]
+_deps_cache: dict[str, dict] | None = None
+
+
+def load_deps_cache() -> dict[str, dict]:
+    """Load the dependency cache once and schedule saving it on exit."""
+    global _deps_cache
+    if _deps_cache is None:
+        try:
+            _deps_cache = json.loads(DEPS_CACHE_FILE.read_text())
+        except (OSError, ValueError):
+            _deps_cache = {}
+        atexit.register(save_deps_cache)
+    return _deps_cache
+
+
+def save_deps_cache():
+    """Persist the dependency cache (best effort)."""
+    try:
+        DEPS_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        DEPS_CACHE_FILE.write_text(json.dumps(_deps_cache))
+    except OSError:
+        pass
+
+
+def stat_stamp(script_path: Path) -> list[int]:
+    """Return the (mtime_ns, size) stamp used as the dependency cache key."""
+    st = os.stat(script_path)
+    return [st.st_mtime_ns, st.st_size]
+
+
+def memoize_by_stat(func):
+    """
+    Cache func(script_path, ...) results keyed by the file's (mtime_ns, size).
+
+    The stamp must be taken before the file is read: an edit racing the read
+    then only costs a cache miss on the next run, never a stale hit. Callers
+    that read the file themselves pass the stamp they took first.
+    """
+    @functools.wraps(func)
+    def wrapper(script_path: Path, *args, stamp: list[int] | None = None) -> list[str]:
+        if stamp is None:
+            stamp = stat_stamp(script_path)
+        key = str(Path(script_path).resolve())
+        cache = load_deps_cache()
+
+        entry = cache.get(key)
+        if entry and entry.get("stat") == stamp:
+            return entry["deps"]
+
+        deps = func(script_path, *args)
+        cache[key] = {"stat": stamp, "deps": deps}
+        return deps
+
+    return wrapper
+
+
+def extract_dependencies_from_bytes(script_bytes: bytes) -> list[str]:
+    """Extract likely pip dependencies from imports in the script source."""
+    try:
+        tree = ast.parse(script_bytes)
+    except SyntaxError:
+        # Let streamlit report the error from inside the sandbox
+        return []
 
-            if module in IMPORT_TO_PIP:
-                deps.add(IMPORT_TO_PIP[module])
+    modules = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            modules.update(alias.name.split(".")[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            modules.add(node.module.split(".")[0])
 
-    return sorted(deps)
+    return sorted({IMPORT_TO_PIP[module] for module in modules & KNOWN_IMPORTS})
 
 
-def run_streamlit_in_e2b(
+@memoize_by_stat
+def extract_dependencies(script_path: Path, script_bytes: bytes | None = None) -> list[str]:
+    """Extract likely pip dependencies from imports in the script (cached by stat)."""
+    if script_bytes is None:
+        script_bytes = script_path.read_bytes()
+    return extract_dependencies_from_bytes(script_bytes)
+
+
+def read_script(script_path: Path) -> tuple[bytes, list[str]]:
+    """Read the script once and detect its dependencies from the same bytes."""
+    stamp = stat_stamp(script_path)
+    script_bytes = script_path.read_bytes()
+    return script_bytes, extract_dependencies(script_path, script_bytes, stamp=stamp)
+
+
+def is_template_missing(error: SandboxException) -> bool:
+    """Check whether a sandbox creation error means the template doesn't exist."""
+    return isinstance(error, NotFoundException) or "not found" in str(error).lower()
+
+
+async def build_default_template(start_time: float):
+    """Build the default template once (takes a few minutes on first build)."""
+    log(start_time, f"Template '{DEFAULT_TEMPLATE}' not found, building it (one-time)...")
+    debug(start_time, f"Running: make -C {TEMPLATE_DIR} build-dev")
+    await asyncio.to_thread(subprocess.run, ["make", "-C", str(TEMPLATE_DIR), "build-dev"], check=True)
+    log(start_time, f"Template '{DEFAULT_TEMPLATE}' built", "OK")
+
+
+async def create_sandbox(
+    start_time: float,
+    template: str | None,
+    env_vars: dict[str, str],
+    timeout: int = 300,
+) -> AsyncSandbox:
+    """Create a sandbox, auto-building the default template if it's missing."""
+    if template is None:
+        return await AsyncSandbox.create(timeout=timeout, envs=env_vars)
+
+    try:
+        return await AsyncSandbox.create(template=template, timeout=timeout, envs=env_vars)
+    except SandboxException as e:
+        if template != DEFAULT_TEMPLATE or not is_template_missing(e):
+            raise
+        await build_default_template(start_time)
+        return await AsyncSandbox.create(template=template, timeout=timeout, envs=env_vars)
+
+
+async def wait_for_streamlit(public_url: str, timeout: float) -> bool:
+    """Poll Streamlit's health endpoint until it answers 200 or timeout expires."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    async with httpx.AsyncClient(timeout=0.3) as client:
+        while loop.time() < deadline:
+            try:
+                response = await client.get(f"{public_url}/_stcore/health")
+                if response.status_code == 200:
+                    return True
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(READY_POLL_INTERVAL)
+    return False
+
+
+def streamlit_command(remote_path: str, port: int, use_template: bool) -> str:
+    """Build the command that starts Streamlit inside the sandbox."""
+    # Template has streamlit in venv - use full path; default sandbox uses uv run
+    streamlit = "/home/user/.venv/bin/streamlit" if use_template else "~/.local/bin/uv run streamlit"
+    return (
+        f"{streamlit} run {remote_path} "
+        f"--server.port {port} "
+        f"--server.headless true "
+        f"--server.address 0.0.0.0 "
+        f"--browser.gatherUsageStats false"
+    )
+
+
+def build_bootstrap_bundle(
+    script_name: str,
+    script_bytes: bytes,
+    deps: list[str],
+    port: int,
+    use_template: bool,
+) -> bytes:
+    """
+    Pack the script and a bootstrap.sh into an in-memory tar.gz.
+
+    The whole sandbox setup (uv/deps install, streamlit start) runs from
+    bootstrap.sh, so it costs one upload + one command instead of an RPC per step.
+    """
+    lines = ["set -e"]
+    if use_template:
+        # Only extras not pre-installed in the template; they come from the warm cache
+        if deps:
+            lines.append(
+                f"~/.local/bin/uv pip install --python {REMOTE_DIR}/.venv/bin/python "
+                f"{UV_INSTALL_FLAGS} {' '.join(deps)}"
+            )
+    else:
+        lines.append("curl -LsSf https://astral.sh/uv/install.sh | sh")
+        if deps:
+            lines.append(f"~/.local/bin/uv pip install --system {UV_INSTALL_FLAGS} {' '.join(deps)}")
+    lines.append(f"exec {streamlit_command(f'{REMOTE_DIR}/{script_name}', port, use_template)}")
+
+    files = {
+        script_name: script_bytes,
+        "bootstrap.sh": ("\n".join(lines) + "\n").encode(),
+    }
+
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w:gz") as tar:
+        for name, data in files.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mode = 0o755 if name.endswith(".sh") else 0o644
+            tar.addfile(info, io.BytesIO(data))
+    return buf.getvalue()
+
+
+async def run_streamlit_in_e2b(
     script_path: Path,
     port: int = 8501,
     open_browser: bool = True,
-    template: str | None = None,
+    template: str | None = DEFAULT_TEMPLATE,
 ):
     """
     Upload and run a Streamlit script in E2B sandbox.
@@ -116,7 +326,8 @@ def run_streamlit_in_e2b(
         script_path: Path to the Streamlit Python script
         port: Port for Streamlit (default 8501)
         open_browser: Whether to open browser automatically
-        template: E2B template name (e.g. 'streamlit-dev'). If None, uses default and installs deps.
+        template: E2B template name (default: DEFAULT_TEMPLATE, built on first use).
+                  If None, uses the base sandbox and installs deps at runtime (slow).
     """
     start_time = time.time()
     use_template = template is not None
@@ -139,27 +350,35 @@ def run_streamlit_in_e2b(
         log(start_time, "Verbose mode: ON", "DEBUG")
     print("-" * 60)
 
-    # Step 1: Detect dependencies (for info, or for installation if no template)
-    log(start_time, "Detecting dependencies from imports...")
-    deps = extract_dependencies(script_path)
-    log(start_time, f"Found: {', '.join(deps)}", "OK")
-
-    # Step 2: Create sandbox
+    # Step 1: Create sandbox while detecting dependencies and reading the script
     if use_template:
         log(start_time, f"Creating E2B sandbox from template '{template}'...")
         debug(start_time, "Using pre-built template - deps already installed!")
     else:
         log(start_time, "Creating E2B sandbox...")
+    log(start_time, "Detecting dependencies from imports...")
     debug(start_time, "Calling E2B API to provision sandbox VM...")
     debug(start_time, "This includes: VM allocation, network setup, filesystem init")
+    debug(start_time, f"Reading local file: {script_path}")
 
     t0 = time.time()
-    if use_template:
-        sandbox = Sandbox.create(template=template, timeout=300, envs=env_vars)
-    else:
-        sandbox = Sandbox.create(timeout=300, envs=env_vars)
+    create_task = asyncio.create_task(create_sandbox(start_time, template, env_vars))
+    try:
+        script_bytes, deps = await asyncio.to_thread(read_script, script_path)
+        # Shielded so Ctrl+C doesn't abort creation before we can kill the sandbox
+        sandbox = await asyncio.shield(create_task)
+    except BaseException:
+        # Read failed or Ctrl+C: don't leave the sandbox running until its timeout
+        try:
+            orphan = await create_task
+        except Exception:
+            pass  # creation itself failed, nothing to kill
+        else:
+            await orphan.kill()
+        raise
     sandbox_created = time.time()
 
+    log(start_time, f"Found: {', '.join(deps)}", "OK")
     log(start_time, f"Sandbox ready! ID: {sandbox.sandbox_id}", "OK")
     log(start_time, f"Sandbox creation took: {sandbox_created - t0:.2f}s", "OK")
 
@@ -175,85 +394,58 @@ def run_streamlit_in_e2b(
             debug(start_time, "  - Network latency: varies by location")
 
     try:
-        # Step 3 & 4: Install uv and dependencies (SKIP if using template)
-        if not use_template:
-            log(start_time, "Installing uv package manager...")
-            debug(start_time, "Downloading uv from astral.sh...")
-            t0 = time.time()
-            sandbox.commands.run("curl -LsSf https://astral.sh/uv/install.sh | sh")
-            sandbox.commands.run("export PATH=$HOME/.local/bin:$PATH")
-            debug(start_time, f"uv install took: {time.time() - t0:.2f}s")
-            log(start_time, "uv installed", "OK")
-
+        # Step 2: Bundle script + bootstrap (template runs install only the extras)
+        if use_template:
+            install_deps = [dep for dep in deps if dep not in TEMPLATE_PACKAGES]
+            if install_deps:
+                log(start_time, f"Installing from template's warm uv cache: {' '.join(install_deps)}")
+            else:
+                log(start_time, "Skipping dependency installation (pre-installed in template)", "OK")
+        else:
+            install_deps = deps
             if deps:
-                deps_str = " ".join(deps)
-                log(start_time, f"Installing dependencies: {deps_str}")
+                log(start_time, f"Dependencies will be installed at startup: {' '.join(deps)}")
                 debug(start_time, "Using 'uv pip install --system' for fast installation")
-                debug(start_time, "uv resolves deps in parallel, downloads from cache when possible")
-
-                t0 = time.time()
-                result = sandbox.commands.run(
-                    f"~/.local/bin/uv pip install --system {deps_str}",
-                    on_stdout=lambda data: log(start_time, data.strip(), "STREAM") if data.strip() else None,
-                    on_stderr=lambda data: log(start_time, f"[pip] {data.strip()}", "STREAM") if data.strip() else None,
-                )
-                debug(start_time, f"Dependencies install took: {time.time() - t0:.2f}s")
-                log(start_time, "Dependencies installed", "OK")
-        else:
-            log(start_time, "Skipping dependency installation (pre-installed in template)", "OK")
-
-        # Step 5: Upload the script
-        log(start_time, "Uploading script to sandbox...")
-        debug(start_time, f"Reading local file: {script_path}")
-        script_content = script_path.read_text()
-        debug(start_time, f"Script size: {len(script_content)} bytes, {len(script_content.splitlines())} lines")
-        remote_path = f"/home/user/{script_path.name}"
+
+        debug(start_time, f"Script size: {len(script_bytes)} bytes, {len(script_bytes.splitlines())} lines")
+        bundle = build_bootstrap_bundle(script_path.name, script_bytes, install_deps, port, use_template)
+
+        # Step 3: Upload the bundle in a single write
+        log(start_time, "Uploading bootstrap bundle to sandbox...")
         t0 = time.time()
-        sandbox.files.write(remote_path, script_content)
-        debug(start_time, f"Upload took: {time.time() - t0:.2f}s")
-        log(start_time, f"Uploaded to {remote_path}", "OK")
+        await sandbox.files.write(BUNDLE_PATH, bundle)
+        debug(start_time, f"Upload took: {time.time() - t0:.2f}s ({len(bundle)} bytes)")
+        log(start_time, f"Uploaded to {BUNDLE_PATH}", "OK")
 
-        # Step 6: Get public URL
+        # Step 4: Get public URL
         debug(start_time, f"Requesting public URL for port {port}...")
         host = sandbox.get_host(port)
         public_url = f"https://{host}"
         debug(start_time, f"E2B provides HTTPS proxy to sandbox port {port}")
         log(start_time, f"Public URL: {public_url}", "OK")
 
-        # Step 7: Start Streamlit in background
+        # Step 5: Unpack and run bootstrap.sh in background with streaming
         log(start_time, "Starting Streamlit server...")
         debug(start_time, "Running streamlit with: headless=true, address=0.0.0.0")
-
-        if use_template:
-            # Template has streamlit in venv - use full path
-            streamlit_cmd = (
-                f"/home/user/.venv/bin/streamlit run {remote_path} "
-                f"--server.port {port} "
-                f"--server.headless true "
-                f"--server.address 0.0.0.0 "
-                f"--browser.gatherUsageStats false"
-            )
-        else:
-            # Need to use uv run for default sandbox
-            streamlit_cmd = (
-                f"~/.local/bin/uv run streamlit run {remote_path} "
-                f"--server.port {port} "
-                f"--server.headless true "
-                f"--server.address 0.0.0.0 "
-                f"--browser.gatherUsageStats false"
-            )
-
-        # Start in background with streaming
-        process = sandbox.commands.run(
-            streamlit_cmd,
+        process = await sandbox.commands.run(
+            f"tar xzf {BUNDLE_PATH} -C {REMOTE_DIR} && bash {REMOTE_DIR}/bootstrap.sh",
             background=True,
             on_stdout=lambda data: log(start_time, data.strip(), "STREAM") if data.strip() else None,
             on_stderr=lambda data: log(start_time, f"[stderr] {data.strip()}", "ERR") if data.strip() else None,
         )
 
-        # Wait a bit for Streamlit to start
+        # Wait until Streamlit actually answers
         log(start_time, "Waiting for Streamlit to start...")
-        time.sleep(3)
+        if not use_template:
+            ready_timeout = READY_TIMEOUT_NO_TEMPLATE
+        elif install_deps:
+            ready_timeout = READY_TIMEOUT_TEMPLATE_EXTRAS
+        else:
+            ready_timeout = READY_TIMEOUT_TEMPLATE
+        if await wait_for_streamlit(public_url, ready_timeout):
+            log(start_time, "Streamlit is ready", "OK")
+        else:
+            log(start_time, f"Streamlit not ready after {ready_timeout:.0f}s, continuing anyway", "ERR")
 
         # Summary
         total_time = time.time() - start_time
@@ -271,35 +463,39 @@ def run_streamlit_in_e2b(
             if not use_template:
                 print(f"     → With custom template this could be ~3-5s total!")
                 print("-" * 60)
-                print("  💡 To speed up:")
-                print("     1. Build custom template: cd e2b-template && make build-dev")
-                print("     2. Run with: python run_streamlit.py script.py --template streamlit-dev")
+                print("  💡 To speed up: drop --no-template to use the pre-built template")
             else:
                 print(f"     ✨ Using template saved ~8s of dependency installation!")
 
         print("=" * 60)
         print("\n📡 Streaming logs (Ctrl+C to stop)...\n")
 
-        # Open browser
+        # Open browser without blocking log streaming (xdg-open/AppleScript can be slow)
         if open_browser:
-            webbrowser.open(public_url)
-
-        # Keep running and streaming logs
-        while True:
-            time.sleep(1)
+            threading.Thread(target=webbrowser.open, args=(public_url,), daemon=True).start()
+
+        # Keep streaming logs until Streamlit exits (Ctrl+C cancels the wait)
+        try:
+            await process.wait()
+            log(start_time, "Streamlit exited", "INFO")
+        except CommandExitException as e:
+            log(start_time, f"Streamlit exited with code {e.exit_code}", "ERR")
+        print("\n" + "=" * 60)
 
-    except KeyboardInterrupt:
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        # asyncio.run() cancels the main task on Ctrl+C
         print("\n\n" + "=" * 60)
         log(start_time, "Shutting down...", "INFO")
-        sandbox.kill()
-        log(start_time, "Sandbox terminated", "OK")
-        print("=" * 60)
 
     except Exception as e:
         log(start_time, f"Error: {e}", "ERR")
-        sandbox.kill()
+        await sandbox.kill()
         raise
 
+    await sandbox.kill()
+    log(start_time, "Sandbox terminated", "OK")
+    print("=" * 60)
+
 
 def main():
     parser = argparse.ArgumentParser(
@@ -307,13 +503,13 @@ def main():
         formatter_class=argparse.RawDescriptionHelpFormatter,
         epilog="""
 Examples:
-  # Without template (slower, ~12s, no build needed)
+  # With pre-built template (fast, ~4s; built automatically on first run)
   python run_streamlit.py scripts/example1.py
 
-  # With custom template (faster, ~4s, requires build first)
-  python run_streamlit.py scripts/example1.py --template keboola-streamlit-dev
+  # Without template (slower, ~12s, installs deps at runtime)
+  python run_streamlit.py scripts/example1.py --no-template
 
-  # Build template first:
+  # Build template manually:
   cd e2b-template && make build-dev
 
 Environment variables are loaded from .env file automatically.
@@ -327,8 +523,10 @@ Required in .env:
     )
     parser.add_argument("script", type=Path, help="Path to Streamlit Python script")
     parser.add_argument("--port", type=int, default=8501, help="Streamlit port (default: 8501)")
-    parser.add_argument("-t", "--template", type=str, default=None,
-                        help="E2B template name (e.g. 'streamlit-dev'). Skips runtime dependency installation.")
+    parser.add_argument("-t", "--template", type=str, default=DEFAULT_TEMPLATE,
+                        help=f"E2B template name (default: {DEFAULT_TEMPLATE}). Skips runtime dependency installation.")
+    parser.add_argument("--no-template", action="store_true",
+                        help="Use the base sandbox and install dependencies at runtime (slow)")
     parser.add_argument("--no-browser", action="store_true",
                         help="Don't open browser automatically")
     parser.add_argument("-v", "--verbose", action="store_true",
@@ -351,12 +549,15 @@ Required in .env:
     VERBOSE = args.verbose
 
     # Run!
-    run_streamlit_in_e2b(
-        script_path=args.script,
-        port=args.port,
-        open_browser=not args.no_browser,
-        template=args.template,
-    )
+    try:
+        asyncio.run(run_streamlit_in_e2b(
+            script_path=args.script,
+            port=args.port,
+            open_browser=not args.no_browser,
+            template=None if args.no_template else args.template,
+        ))
+    except KeyboardInterrupt:
+        pass
 
 
 if __name__ == "__main__":
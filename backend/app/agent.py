@@ -21,18 +21,28 @@ Features:
 - Conversation memory across multiple chat turns
 """
 
+import asyncio
+import contextlib
+import dataclasses
+import functools
+import inspect
 import logging
 import os
 import re
+import reprlib
+import shlex
+import sys
 import tempfile
 import time
+import types
 from pathlib import Path
-from typing import AsyncIterator, Callable, Optional
+from typing import Any, AsyncIterator, Awaitable, Callable, Mapping, Optional
 
 from claude_agent_sdk import (
     ClaudeSDKClient,
     ClaudeAgentOptions,
     AssistantMessage,
+    ResultMessage,
     TextBlock,
     ToolUseBlock,
     ToolResultBlock,
@@ -41,12 +51,37 @@ from claude_agent_sdk import (
 )
 
 from .sandbox_factory import create_sandbox_manager
-from .tools.sandbox_tools import create_sandbox_tools_server, create_e2b_only_server
 from .logging_config import get_session_logger
+from .tools.sandbox_tools import get_guideline_sections
 
 # Default model if not specified in environment
 DEFAULT_MODEL = "claude-sonnet-4-5"
 
+# Tool names compared in hooks and the permission callback
+TOOL_READ = sys.intern("Read")
+TOOL_WRITE = sys.intern("Write")
+TOOL_EDIT = sys.intern("Edit")
+TOOL_BASH = sys.intern("Bash")
+TOOL_GLOB = sys.intern("Glob")
+TOOL_GREP = sys.intern("Grep")
+TOOL_TASK = sys.intern("Task")
+MCP_E2B_GET_PREVIEW_URL = sys.intern("mcp__e2b__sandbox_get_preview_url")
+MCP_E2B_START_DEV_SERVER = sys.intern("mcp__e2b__sandbox_start_dev_server")
+MCP_E2B_READ_GUIDELINES = sys.intern("mcp__e2b__sandbox_read_guidelines")
+MCP_SANDBOX_GET_PREVIEW_URL = sys.intern("mcp__sandbox__sandbox_get_preview_url")
+MCP_SANDBOX_START_DEV_SERVER = sys.intern("mcp__sandbox__sandbox_start_dev_server")
+
+# Tools whose file_path is checked against SENSITIVE_PATTERNS
+FILE_TOOLS = frozenset({TOOL_READ, TOOL_WRITE, TOOL_EDIT})
+
+# Tools whose results can carry the preview URL (both modes)
+PREVIEW_URL_TOOLS = frozenset({
+    MCP_E2B_GET_PREVIEW_URL,
+    MCP_E2B_START_DEV_SERVER,
+    MCP_SANDBOX_GET_PREVIEW_URL,
+    MCP_SANDBOX_START_DEV_SERVER,
+})
+
 
 def get_sandbox_mode() -> str:
     """Get the current sandbox mode from environment."""
@@ -57,7 +92,9 @@ def get_sandbox_mode() -> str:
 # SYSTEM PROMPT - Using preset + append pattern
 # =============================================================================
 
-SYSTEM_PROMPT_APPEND = """
+# The prompt has literal braces (JS snippets), so the guideline section list
+# is substituted with str.replace rather than str.format
+SYSTEM_PROMPT_APPEND = sys.intern("""
 ## App Builder Context
 
 You are building data-driven web applications in a sandbox environment.
@@ -76,22 +113,7 @@ The sandbox has Next.js 14 with TypeScript, Tailwind CSS, and shadcn/ui pre-conf
 **Custom Tools (for sandbox-specific operations):**
 - `mcp__e2b__sandbox_get_preview_url` - Get the live preview URL
 - `mcp__e2b__sandbox_start_dev_server` - Start the Next.js dev server (ALWAYS use this, never run npm run dev via Bash!)
-
-### Workflow
-
-1. **Create** - Use `Write` to create new files
-2. **Edit** - Use `Edit` for modifications (NOT Write for existing files)
-3. **Verify** - Run `npm run build` via Bash to check for errors
-4. **Fix** - If errors, read the files and fix them
-5. **Preview** - Start dev server and provide preview URL
-
-### Code Quality
-
-- Always use TypeScript with proper types
-- Use 'use client' for interactive components
-- Follow React best practices (hooks, composition)
-- Make UI responsive with Tailwind CSS
-- Handle loading and error states
+- `mcp__e2b__sandbox_read_guidelines` - Read detailed guidelines: {guideline_sections}. Consult one only when you need it (e.g. error handling when a build fails); don't read them up front.
 
 ### CRITICAL: next.config.js for Preview
 
@@ -116,22 +138,6 @@ const nextConfig = {
 module.exports = nextConfig;
 ```
 
-### Project Structure
-
-```
-/app
-  /layout.tsx          # Root layout
-  /page.tsx            # Home page
-  /api/                # API routes
-/components
-  /ui/                 # shadcn/ui components
-  /charts/             # Chart components
-/lib
-  /utils.ts            # Utility functions
-/types
-  /index.ts            # TypeScript types
-```
-
 ### Running & Validation
 
 Before considering the app complete:
@@ -145,176 +151,75 @@ Before considering the app complete:
 **NEVER run `npm run dev` via Bash!** It will use port 3000 which conflicts with the frontend.
 **ALWAYS use `mcp__e2b__sandbox_start_dev_server` tool** - it automatically allocates a free port (3001+) and returns the correct preview URL.
 
-### Error Handling
-
-If build fails:
-1. Read the error message carefully
-2. Use Glob/Grep to find the problematic files
-3. Use Read to examine the context
-4. Use Edit to fix the issues surgically
-5. Run build again to verify
-
 ### Subagents Available
 
 You can delegate tasks to specialized subagents using the Task tool:
 - `code-reviewer`: Reviews TypeScript/React code for errors. Use when build fails.
 - `error-fixer`: Fixes specific code errors identified by code-reviewer.
 - `component-generator`: Generates React components with TypeScript and Tailwind.
-"""
+""".replace("{guideline_sections}", ", ".join(f"`{section}`" for section in get_guideline_sections())))
 
 # =============================================================================
 # SUBAGENTS - Specialized agents for different tasks
 # =============================================================================
 
-AGENTS = {
-    "code-reviewer": AgentDefinition(
-        description="Reviews TypeScript/React code for errors. Use when build fails or you need code review.",
-        prompt="""You are an expert TypeScript/React code reviewer.
-
-## Your Task
-Analyze error messages and source code to identify issues.
-
-## Process
-1. Read the error message carefully
-2. Use Grep to find the problematic code
-3. Use Read to examine the full context
-4. Identify the exact issue
-
-## Output Format
-For each issue found, report in this format:
-```
-FILE: path/to/file.tsx
-LINE: 42
-ISSUE: Brief description of the problem
-CONFIDENCE: 85%
-FIX: Suggested fix (be specific about what to change)
-```
-
-## Rules
-- Only report issues with confidence >= 80%
-- Focus on actual errors, not style preferences
-- Be specific about line numbers and fixes
-- Check for: missing imports, type errors, syntax errors, undefined variables
-""",
-        tools=["Read", "Grep", "Glob"],
-        model="haiku"  # Cost-effective for review tasks
-    ),
-
-    "error-fixer": AgentDefinition(
-        description="Fixes specific code errors identified by code-reviewer.",
-        prompt="""You are a precise code fixer.
-
-## Your Task
-Apply specific fixes to code based on error analysis.
-
-## Process
-1. Read the current file content
-2. Use Edit to make surgical changes (old_string → new_string)
-3. Verify the change makes sense in context
-
-## Rules
-- Use Edit tool, NOT Write (preserves more context)
-- Make minimal changes - fix only what's broken
-- One fix at a time
-- Preserve existing code style and formatting
-- After fixing, briefly explain what you changed
-
-## Common Fixes
-- Missing imports: Add the import at the top
-- Type errors: Add proper type annotations
-- Undefined variables: Check for typos or add declarations
-- Syntax errors: Fix brackets, semicolons, etc.
-""",
-        tools=["Read", "Edit"],
-        model="sonnet"
-    ),
-
-    "component-generator": AgentDefinition(
-        description="Generates React components with TypeScript and Tailwind. Use for creating new UI components.",
-        prompt="""You are a React component specialist.
+# Subagent prompts live in prompts/agents/<name>.md and are read on first use
+AGENT_PROMPTS_DIR = Path(__file__).parent / "prompts" / "agents"
+
+AGENT_META = {
+    "code-reviewer": {
+        "description": "Reviews TypeScript/React code for errors. Use when build fails or you need code review.",
+        "tools": (TOOL_READ, TOOL_GREP, TOOL_GLOB),
+        "model": "haiku",  # Cost-effective for review tasks
+    },
+
+    "error-fixer": {
+        "description": "Fixes specific code errors identified by code-reviewer.",
+        "tools": (TOOL_READ, TOOL_EDIT),
+        "model": "sonnet",
+    },
+
+    "component-generator": {
+        "description": "Generates React components with TypeScript and Tailwind. Use for creating new UI components.",
+        "tools": (TOOL_WRITE, TOOL_READ),
+        "model": "sonnet",
+    },
+}
 
-## Stack
-- React 18 with hooks
-- TypeScript strict mode
-- Tailwind CSS for styling
-- shadcn/ui for UI primitives
 
-## Component Structure
-```typescript
-'use client'  // Only if using hooks/state/effects
+@functools.cache
+def _load_agent_prompt(name: str) -> str:
+    """Read a subagent prompt from prompts/agents/<name>.md."""
+    return sys.intern((AGENT_PROMPTS_DIR / f"{name}.md").read_text(encoding="utf-8"))
 
-import { ComponentType } from 'react'
 
-interface Props {
-  // Define all props with proper types
-}
+@functools.cache
+def get_agent(name: str) -> AgentDefinition:
+    """Build the AgentDefinition for a subagent listed in AGENT_META."""
+    return AgentDefinition(prompt=_load_agent_prompt(name), **AGENT_META[name])
 
-export default function ComponentName({ prop1, prop2 }: Props) {
-  // Implementation
-  return (
-    <div className="...">
-      {/* JSX */}
-    </div>
-  )
-}
-```
 
-## Rules
-- Use 'use client' ONLY for components with state, effects, or event handlers
-- Export as default
-- Include proper TypeScript types for all props
-- Make responsive with Tailwind (mobile-first)
-- Use semantic HTML elements
-- Include loading and error states where appropriate
-- Use Tailwind's design system (spacing: 4, 8, 16..., colors: slate, blue...)
-""",
-        tools=["Write", "Read"],
-        model="sonnet"
-    ),
-}
+@functools.cache
+def get_agents() -> Mapping[str, AgentDefinition]:
+    """Return all subagent definitions, keyed by name (read-only, shared)."""
+    return types.MappingProxyType({name: get_agent(name) for name in AGENT_META})
 
 
 # =============================================================================
 # HOOKS - Self-correction and logging
 # =============================================================================
 
-async def validate_build_result(
-    input_data: dict,
-    tool_use_id: str | None,
-    context: dict
-) -> dict:
-    """
-    PostToolUse hook - validates build results and triggers self-correction.
-
-    When `npm run build` or `npx tsc` fails, this hook adds a system message
-    instructing the agent to use subagents to analyze and fix the errors.
-    """
-    if input_data.get("tool_name") != "Bash":
-        return {}
+# Commands whose failure triggers self-correction (one regex pass per Bash call)
+_BUILD_CMD_RE = re.compile(r"npm run build|npx tsc|next build|npm run type-check")
 
-    tool_input = input_data.get("tool_input", {})
-    command = tool_input.get("command", "")
-    response = input_data.get("tool_response", {})
-
-    # Get exit code from response
-    exit_code = response.get("exitCode", 0)
-    output = response.get("output", "")
-
-    # Check if this is a build command
-    build_commands = ["npm run build", "npx tsc", "next build", "npm run type-check"]
-    is_build_command = any(cmd in command for cmd in build_commands)
-
-    if is_build_command and exit_code != 0:
-        # Build failed - trigger self-correction
-        logger.warning(f"Build failed (exit code {exit_code}), triggering self-correction")
-        return {
-            "systemMessage": f"""## Build Failed - Self-Correction Required
+# System message injected when a build command fails
+_BUILD_FAIL_TEMPLATE = sys.intern("""## Build Failed - Self-Correction Required
 
 The build command failed with exit code {exit_code}.
 
 ### Error Output:
 ```
-{output[:2000]}
+{output}
 ```
 
 ### Required Actions:
@@ -328,41 +233,123 @@ Use Task tool with subagent_type="code-reviewer" to analyze the build errors abo
 ```
 
 Do NOT proceed to preview until the build succeeds.
-"""
-        }
+""")
 
-    return {}
 
+# Shared read-only stand-in for missing tool_input/tool_response
+_EMPTY_MAPPING: Mapping = types.MappingProxyType({})
 
-async def log_tool_usage(
-    input_data: dict,
-    tool_use_id: str | None,
-    context: dict
-) -> dict:
+
+@dataclasses.dataclass(slots=True, frozen=True)
+class HookEvent:
+    """Tool-call fields decoded once from a hook's ``input_data`` dict."""
+    tool_name: str
+    tool_input: Mapping
+    tool_response: Mapping
+    session_id: Optional[str]
+
+
+def _as_event(input_data: dict) -> HookEvent:
+    """Parse SDK hook input into a HookEvent."""
+    return HookEvent(
+        # JSON-decoded names are not interned; do it once so later
+        # comparisons against the TOOL_* constants hit the identity check
+        tool_name=sys.intern(input_data.get("tool_name") or "unknown"),
+        tool_input=input_data.get("tool_input") or _EMPTY_MAPPING,
+        tool_response=input_data.get("tool_response") or _EMPTY_MAPPING,
+        session_id=input_data.get("session_id"),
+    )
+
+
+def hook_handler(fn: Callable[[HookEvent], Awaitable[dict]]):
+    """
+    Adapt an ``async fn(ev: HookEvent) -> dict`` body to the SDK hook
+    signature ``(input_data, tool_use_id, context) -> dict``.
+    """
+    @functools.wraps(fn)
+    async def wrapper(input_data: dict, tool_use_id: str | None, context: dict) -> dict:
+        return await fn(_as_event(input_data))
+    return wrapper
+
+
+# Shared "no changes" hook result. A plain dict rather than a
+# MappingProxyType because the SDK JSON-encodes hook output; treat it as
+# read-only - hooks that need to add keys must return a new dict.
+_NOOP: dict = {}
+
+# Bounded repr for tool inputs in logs
+_LOG_REPR = reprlib.Repr()
+_LOG_REPR.maxstring = 200
+_LOG_REPR.maxother = 200
+_LOG_REPR.maxdict = 4
+_LOG_REPR.maxlist = 4
+
+
+@hook_handler
+async def validate_build_result(ev: HookEvent) -> dict:
+    """
+    PostToolUse hook - validates build results and triggers self-correction.
+
+    When `npm run build` or `npx tsc` fails, this hook adds a system message
+    instructing the agent to use subagents to analyze and fix the errors.
+    """
+    command = ev.tool_input.get("command", "")
+
+    # Get exit code from response
+    exit_code = ev.tool_response.get("exitCode", 0)
+
+    # Only failed build commands trigger self-correction
+    if exit_code == 0 or not _BUILD_CMD_RE.search(command):
+        return _NOOP
+
+    # Keep only the tail - compilers print the failing lines last
+    output = ev.tool_response.get("output", "")
+    if len(output) > 2000:
+        output = output[-2000:]
+
+    logger.warning(
+        "Build failed (exit code %s), triggering self-correction",
+        exit_code,
+        extra={"session_id": ev.session_id},
+    )
+    return {
+        "systemMessage": _BUILD_FAIL_TEMPLATE.format_map(
+            {"exit_code": exit_code, "output": output}
+        )
+    }
+
+
+@hook_handler
+async def log_tool_usage(ev: HookEvent) -> dict:
     """
     PreToolUse hook - logs all tool calls for debugging and monitoring.
     """
-    tool_name = input_data.get("tool_name", "unknown")
-    tool_input = input_data.get("tool_input", {})
+    if not logger.isEnabledFor(logging.INFO):
+        return _NOOP
 
-    # Log the tool call (truncate long inputs)
-    input_str = str(tool_input)
-    if len(input_str) > 200:
-        input_str = input_str[:200] + "..."
+    # Log the tool call. The bounded repr stops formatting at its limits,
+    # so a Write carrying a whole file costs the same as a Read.
+    logger.info("[HOOK] Tool call: %s, input: %s", ev.tool_name, _LOG_REPR.repr(ev.tool_input))
 
-    logger.info(f"[HOOK] Tool call: {tool_name}, input: {input_str}")
+    return _NOOP
 
-    return {}
 
+# PostToolUse hooks keyed by tool name. Each entry becomes its own SDK
+# HookMatcher, so the CLI only calls back into Python for tools that have
+# a hook - Read/Glob/Grep etc. never enter the event loop here.
+_POST_HOOKS = {
+    TOOL_BASH: (validate_build_result,),
+}
 
-# Hook configuration
+# Hook configuration (read-only; shared by every session's options)
 HOOKS = {
-    "PreToolUse": [
-        HookMatcher(hooks=[log_tool_usage]),
-    ],
-    "PostToolUse": [
-        HookMatcher(matcher="Bash", hooks=[validate_build_result]),
-    ],
+    "PreToolUse": (
+        HookMatcher(hooks=(log_tool_usage,)),
+    ),
+    "PostToolUse": tuple(
+        HookMatcher(matcher=tool_name, hooks=hooks)
+        for tool_name, hooks in _POST_HOOKS.items()
+    ),
 }
 
 
@@ -370,15 +357,186 @@ HOOKS = {
 # PERMISSION CALLBACK - Dynamic tool access control
 # =============================================================================
 
-async def permission_callback(
-    tool_name: str,
-    input_data: dict,
-    context: dict
-) -> dict:
+# Dangerous patterns that should never be allowed (matched case-insensitively)
+DANGEROUS_PATTERNS = (
+    "rm -rf /",
+    "rm -rf ~",
+    "rm -rf *",
+    "sudo ",
+    "> /dev/",
+    "mkfs",
+    "dd if=",
+    ":(){:|:&};:",  # Fork bomb
+    "chmod -R 777 /",
+    "curl | bash",
+    "wget | bash",
+)
+
+# Potentially dangerous commands (logged, but allowed)
+WARNING_PATTERNS = ("rm -rf", "chmod 777", "npm run", "npx")
+
+# Sensitive file patterns (matched case-insensitively)
+SENSITIVE_PATTERNS = (
+    ".env",
+    "credentials",
+    "secrets",
+    ".git/config",
+    "id_rsa",
+    ".ssh/",
+    "password",
+    ".npmrc",
+)
+
+
+def _compile_patterns(patterns: tuple[str, ...], flags: int = 0) -> re.Pattern:
+    """Compile literal substrings into one alternation scanned in a single pass."""
+    return re.compile("|".join(map(re.escape, patterns)), flags)
+
+
+# All pattern checks ignore case; IGNORECASE matches without lowering the
+# input string first
+_DANGEROUS_RE = _compile_patterns(DANGEROUS_PATTERNS, re.IGNORECASE)
+_WARNING_RE = _compile_patterns(WARNING_PATTERNS, re.IGNORECASE)
+_SENSITIVE_RE = _compile_patterns(SENSITIVE_PATTERNS, re.IGNORECASE)
+
+# Token-level checks that catch what substring matching misses
+# (extra whitespace, reordered flags, chained or path-qualified commands).
+# An unquoted newline separates commands just like ";"
+_SHELL_OPERATOR_CHARS = ";&|\n"
+_ENV_ASSIGNMENT_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*=")
+DANGEROUS_COMMANDS = frozenset({"sudo", "dd", "mkfs"})
+RM_DANGEROUS_TARGETS = frozenset({"/", "/*", "~", "~/", "~/*", "*"})
+
+
+def _split_subcommands(command: str) -> list[list[str]]:
+    """Tokenize a shell command once and group the tokens into per-command argv lists."""
+    lexer = shlex.shlex(command, posix=True, punctuation_chars=_SHELL_OPERATOR_CHARS)
+    lexer.whitespace = " \t\r"
+    lexer.whitespace_split = True
+    lexer.commenters = ""
+
+    commands = [[]]
+    try:
+        for token in lexer:
+            if token.strip(_SHELL_OPERATOR_CHARS):
+                commands[-1].append(token)
+            else:
+                commands.append([])
+    except ValueError:
+        # Unbalanced quotes - keep the tokens before the unterminated argument
+        pass
+    return commands
+
+
+def _dangerous_subcommand(command: str) -> Optional[str]:
     """
-    Dynamic permission control for tool usage.
+    Tokenize a shell command with shlex, split it into sub-commands on
+    operator tokens and return a short label for the first dangerous one
+    (None if safe). Operators inside quotes stay part of their argument.
+    """
+    for argv in _split_subcommands(command):
+        # Skip leading VAR=value assignments
+        i = 0
+        while i < len(argv) and _ENV_ASSIGNMENT_RE.match(argv[i]):
+            i += 1
+        if i == len(argv):
+            continue
+
+        name = os.path.basename(argv[i])
+        args = argv[i + 1:]
+
+        if name in DANGEROUS_COMMANDS or name.startswith("mkfs."):
+            return name
+
+        if name == "rm":
+            short_flags = "".join(a[1:] for a in args if a.startswith("-") and not a.startswith("--"))
+            recursive = "r" in short_flags or "R" in short_flags or "--recursive" in args
+            if recursive:
+                for target in args:
+                    if target in RM_DANGEROUS_TARGETS:
+                        return f"rm -r {target}"
+
+    return None
+
+
+# Agents retry the same commands and touch the same files repeatedly, so
+# verdicts are memoised. Only the pure classification is cached; logging
+# stays in the callers so every call is still logged.
+_PERMISSION_CACHE_SIZE = 1024
+# Longer commands (heredoc file writes etc.) are classified uncached so the
+# cache does not pin large strings
+_MAX_CACHED_COMMAND_LEN = 1024
+
+
+@functools.lru_cache(maxsize=_PERMISSION_CACHE_SIZE)
+def _classify_command(command: str) -> tuple[Optional[str], bool]:
+    """Return (deny label or None, is risky) for a Bash command."""
+    match = _DANGEROUS_RE.search(command)
+    if match:
+        return match.group(0), False
+
+    label = _dangerous_subcommand(command)
+    if label:
+        return label, False
+
+    return None, _WARNING_RE.search(command) is not None
 
-    This callback validates tool calls and can:
+
+@functools.lru_cache(maxsize=_PERMISSION_CACHE_SIZE)
+def _is_sensitive_path(file_path: str) -> bool:
+    """Return True if file_path matches SENSITIVE_PATTERNS."""
+    return _SENSITIVE_RE.search(file_path) is not None
+
+
+def _check_bash(input_data: dict) -> Optional[dict]:
+    """Deny dangerous shell commands; log risky ones."""
+    command = input_data.get("command", "")
+
+    if len(command) <= _MAX_CACHED_COMMAND_LEN:
+        label, risky = _classify_command(command)
+    else:
+        label, risky = _classify_command.__wrapped__(command)
+
+    if label:
+        logger.warning("[PERMISSION] Blocked dangerous command: %s", command)
+        return {
+            "behavior": "deny",
+            "message": f"Dangerous command blocked: {label}"
+        }
+
+    # Warn about potentially dangerous commands (but allow them)
+    if risky:
+        logger.info("[PERMISSION] Allowing potentially risky command: %s", command)
+
+    return None
+
+
+def _check_file(input_data: dict) -> Optional[dict]:
+    """Deny access to sensitive files."""
+    file_path = input_data.get("file_path", "")
+
+    if _is_sensitive_path(file_path):
+        logger.warning("[PERMISSION] Blocked access to sensitive file: %s", file_path)
+        return {
+            "behavior": "deny",
+            "message": f"Access to sensitive file denied: {file_path}"
+        }
+
+    return None
+
+
+# Per-tool permission checks; tools without an entry are always allowed
+_VALIDATORS: dict[str, Callable[[dict], Optional[dict]]] = {
+    TOOL_BASH: _check_bash,
+    **dict.fromkeys(FILE_TOOLS, _check_file),
+}
+
+
+def check_permission(tool_name: str, input_data: dict) -> dict:
+    """
+    Dynamic permission control for tool usage (synchronous core).
+
+    This check validates tool calls and can:
     - Allow the call to proceed
     - Deny the call with a message
     - Modify the input (e.g., sanitize paths)
@@ -388,70 +546,30 @@ async def permission_callback(
         Optional "message" for deny
         Optional "updatedInput" for modified input
     """
-    # Block dangerous Bash commands
-    if tool_name == "Bash":
-        command = input_data.get("command", "")
-
-        # Dangerous patterns that should never be allowed
-        dangerous_patterns = [
-            "rm -rf /",
-            "rm -rf ~",
-            "rm -rf *",
-            "sudo ",
-            "> /dev/",
-            "mkfs",
-            "dd if=",
-            ":(){:|:&};:",  # Fork bomb
-            "chmod -R 777 /",
-            "curl | bash",
-            "wget | bash",
-        ]
-
-        for pattern in dangerous_patterns:
-            if pattern in command:
-                logger.warning(f"[PERMISSION] Blocked dangerous command: {command}")
-                return {
-                    "behavior": "deny",
-                    "message": f"Dangerous command blocked: {pattern}"
-                }
-
-        # Warn about potentially dangerous commands (but allow them)
-        warning_patterns = ["rm -rf", "chmod 777", "npm run", "npx"]
-        for pattern in warning_patterns:
-            if pattern in command:
-                logger.info(f"[PERMISSION] Allowing potentially risky command: {command}")
-
-    # Block access to sensitive files
-    if tool_name in ["Read", "Write", "Edit"]:
-        file_path = input_data.get("file_path", "")
-
-        # Sensitive file patterns
-        sensitive_patterns = [
-            ".env",
-            "credentials",
-            "secrets",
-            ".git/config",
-            "id_rsa",
-            ".ssh/",
-            "password",
-            ".npmrc",
-        ]
-
-        file_path_lower = file_path.lower()
-        for pattern in sensitive_patterns:
-            if pattern in file_path_lower:
-                logger.warning(f"[PERMISSION] Blocked access to sensitive file: {file_path}")
-                return {
-                    "behavior": "deny",
-                    "message": f"Access to sensitive file denied: {file_path}"
-                }
+    validator = _VALIDATORS.get(tool_name)
+    if validator:
+        result = validator(input_data)
+        if result:
+            return result
 
     # Allow all other operations
     return {"behavior": "allow"}
 
 
+async def permission_callback(
+    tool_name: str,
+    input_data: dict,
+    context: dict
+) -> dict:
+    """
+    can_use_tool callback. The SDK awaits this, so it stays a coroutine, but
+    the work is pure CPU and lives in check_permission().
+    """
+    return check_permission(tool_name, input_data)
+
+
 # Legacy system prompt for E2B mode (kept for backwards compatibility)
-LEGACY_SYSTEM_PROMPT = """You are an expert Next.js/React/TypeScript developer building data-driven web applications in an isolated sandbox environment.
+LEGACY_SYSTEM_PROMPT = sys.intern("""You are an expert Next.js/React/TypeScript developer building data-driven web applications in an isolated sandbox environment.
 
 CRITICAL: You are working in a sandbox environment. ALL commands and file operations run INSIDE this sandbox. NEVER tell the user to run commands themselves - YOU must run everything in the sandbox using your tools.
 
@@ -513,11 +631,136 @@ const nextConfig = {
 
 module.exports = nextConfig;
 ```
-"""
+""")
+
+
+@functools.cache
+def get_system_prompt(mode: str) -> str:
+    """
+    Return the system prompt text for a sandbox mode.
+
+    LOCAL mode appends to the claude_code preset; E2B mode uses the legacy
+    standalone prompt. Resolved once per mode, so callers share one string.
+    """
+    if mode == "local":
+        return SYSTEM_PROMPT_APPEND
+    return LEGACY_SYSTEM_PROMPT
+
+
+# Native tools + E2B MCP tools + Task for subagents (LOCAL mode)
+LOCAL_ALLOWED_TOOLS = (
+    # Native Claude Code tools
+    TOOL_READ, TOOL_WRITE, TOOL_EDIT,
+    TOOL_BASH,
+    TOOL_GLOB, TOOL_GREP,
+    TOOL_TASK,  # For spawning subagents
+    # E2B-specific MCP tools (note: includes 'sandbox_' prefix from tool function names)
+    MCP_E2B_GET_PREVIEW_URL,
+    MCP_E2B_START_DEV_SERVER,
+    MCP_E2B_READ_GUIDELINES,
+)
+
+# Full MCP sandbox toolset (E2B mode, legacy approach)
+E2B_ALLOWED_TOOLS = (
+    "mcp__sandbox__sandbox_write_file",
+    "mcp__sandbox__sandbox_read_file",
+    "mcp__sandbox__sandbox_list_files",
+    "mcp__sandbox__sandbox_run_command",
+    "mcp__sandbox__sandbox_install_packages",
+    MCP_SANDBOX_GET_PREVIEW_URL,
+    MCP_SANDBOX_START_DEV_SERVER,
+)
+
+
+@functools.cache
+def build_agent_options() -> ClaudeAgentOptions:
+    """
+    Build the session-independent LOCAL mode options once per process.
+
+    The returned instance is shared - never mutate it. Sessions derive their
+    own options with dataclasses.replace() to add cwd, model and MCP servers.
+    """
+    return ClaudeAgentOptions(
+        # Use Claude Code preset with our app builder additions
+        system_prompt={
+            "type": "preset",
+            "preset": "claude_code",
+            "append": get_system_prompt("local"),
+        },
+
+        # Native tools + E2B MCP tools + Task for subagents
+        allowed_tools=LOCAL_ALLOWED_TOOLS,
+
+        # Specialized subagents for code review, error fixing, and component generation
+        agents=get_agents(),
+
+        # Hooks for self-correction and logging
+        hooks=HOOKS,
+
+        # Permission callback for dynamic tool access control
+        can_use_tool=permission_callback,
+
+        # Accept edits automatically for faster workflow
+        permission_mode="acceptEdits",
+    )
+
+
+@functools.cache
+def build_legacy_agent_options() -> ClaudeAgentOptions:
+    """
+    Build the session-independent E2B mode options once per process.
+
+    Shared like build_agent_options(); sessions add model and MCP servers
+    with dataclasses.replace().
+    """
+    return ClaudeAgentOptions(
+        system_prompt=get_system_prompt("e2b"),
+        allowed_tools=E2B_ALLOWED_TOOLS,
+        permission_mode="acceptEdits",
+    )
 
 
 logger = logging.getLogger(__name__)
 
+# LOCAL mode sandboxes live at <tmp>/app-builder/<session_id>
+SANDBOX_BASE_DIR = Path(tempfile.gettempdir()) / "app-builder"
+
+# How long interrupt() waits for the interrupted turn's remaining messages
+INTERRUPT_DRAIN_TIMEOUT = 10
+
+# How long cleanup() waits for queued async on_event callbacks to be delivered
+EVENT_FLUSH_TIMEOUT = 5
+
+# Dev server URL as printed in tool results
+_LOCALHOST_PREFIX = "http://localhost:"
+_LOCALHOST_RE = re.compile(r"http://localhost:\d+")
+
+
+# Whole-message greetings/thanks that need no tools or heavy reasoning
+_SIMPLE_MESSAGE_RE = re.compile(
+    r"\s*(?:(?:hi|hello|hey)(?: there)?|thanks|thank you|thx|good (?:morning|afternoon|evening))[\s!.]*",
+    re.IGNORECASE,
+)
+
+
+def _is_simple_message(message: str) -> bool:
+    """True for short small-talk messages that can go to CLAUDE_SIMPLE_MODEL."""
+    return len(message) < 40 and _SIMPLE_MESSAGE_RE.fullmatch(message) is not None
+
+
+def _find_localhost_url(text: str) -> Optional[str]:
+    """
+    Return the first http://localhost:<port> URL in text. str.find locates
+    candidates and the regex only confirms the port at that offset.
+    """
+    idx = text.find(_LOCALHOST_PREFIX)
+    while idx != -1:
+        match = _LOCALHOST_RE.match(text, idx)
+        if match:
+            return match.group(0)
+        idx = text.find(_LOCALHOST_PREFIX, idx + 1)
+    return None
+
 
 class AppBuilderAgent:
     """
@@ -531,6 +774,28 @@ class AppBuilderAgent:
     - MCP only for E2B-specific operations (preview URL, dev server)
     """
 
+    # One agent per session; fixed attribute layout, no per-instance __dict__
+    __slots__ = (
+        "session_id",
+        "on_event",
+        "client",
+        "sandbox_manager",
+        "mcp_server",
+        "slogger",
+        "_initialized",
+        "_model",
+        "_simple_model",
+        "_active_model",
+        "_sandbox_notified",
+        "_sandbox_path",
+        "_event_queue",
+        "_drain_task",
+        "_preview_url",
+        "_preview_url_tool_ids",
+        "_after_tool_block",
+        "_block_handlers",
+    )
+
     def __init__(self, session_id: Optional[str] = None, on_event: Optional[Callable] = None):
         """
         Initialize the AppBuilderAgent.
@@ -539,6 +804,8 @@ class AppBuilderAgent:
             session_id: Unique session identifier for logging context
             on_event: Optional callback for frontend notifications.
                      Called with event dict: {"type": "...", ...}
+                     May be async; coroutine callbacks are awaited in order
+                     by a background task so they never stall streaming.
         """
         self.session_id = session_id or "unknown"
         self.on_event = on_event
@@ -549,6 +816,27 @@ class AppBuilderAgent:
         self._sandbox_notified = False
         self._sandbox_path: Optional[Path] = None
 
+        # Main model, optional cheaper model for small talk, and the one in use
+        self._model: Optional[str] = None
+        self._simple_model: Optional[str] = None
+        self._active_model: Optional[str] = None
+
+        # Async on_event results, awaited off the streaming path (created lazily)
+        self._event_queue: Optional[asyncio.Queue] = None
+        self._drain_task: Optional[asyncio.Task] = None
+
+        # Per-turn streaming state (reset at the start of each chat())
+        self._preview_url: Optional[str] = None
+        self._preview_url_tool_ids: set[str] = set()  # pending PREVIEW_URL_TOOLS calls
+        self._after_tool_block = False  # last block was tool_use/tool_result
+
+        # Content block dispatch for chat(): one dict lookup per block
+        self._block_handlers: dict[type, Callable[[Any], dict]] = {
+            TextBlock: self._handle_text_block,
+            ToolUseBlock: self._handle_tool_use_block,
+            ToolResultBlock: self._handle_tool_result_block,
+        }
+
         # Initialize session logger
         self.slogger = get_session_logger(self.session_id)
         self.slogger.log_agent("INIT", "AppBuilderAgent created (Phase 2: native tools)")
@@ -556,9 +844,10 @@ class AppBuilderAgent:
         logger.info(f"[{self.session_id}] AppBuilderAgent created")
 
     def _get_sandbox_path(self) -> Path:
-        """Get the sandbox directory path for this session."""
-        base_dir = Path(tempfile.gettempdir()) / "app-builder"
-        return base_dir / self.session_id
+        """Get the sandbox directory path for this session (computed once)."""
+        if self._sandbox_path is None:
+            self._sandbox_path = SANDBOX_BASE_DIR / self.session_id
+        return self._sandbox_path
 
     async def initialize(self) -> None:
         """
@@ -583,6 +872,8 @@ class AppBuilderAgent:
         else:
             await self._initialize_e2b_mode(model)
 
+        self._model = self._active_model = model
+        self._simple_model = os.getenv("CLAUDE_SIMPLE_MODEL") or None
         self._initialized = True
         self.slogger.log_agent("INIT_DONE", f"model={model}, mode={mode}")
         logger.info(f"[{self.session_id}] Agent initialized successfully")
@@ -591,9 +882,9 @@ class AppBuilderAgent:
         """Initialize agent for LOCAL mode with native tools."""
 
         # Get sandbox path and ensure it exists
-        self._sandbox_path = self._get_sandbox_path()
-        self._sandbox_path.mkdir(parents=True, exist_ok=True)
-        logger.info(f"[{self.session_id}] Sandbox path: {self._sandbox_path}")
+        sandbox_path = self._get_sandbox_path()
+        sandbox_path.mkdir(parents=True, exist_ok=True)
+        logger.info(f"[{self.session_id}] Sandbox path: {sandbox_path}")
 
         # Initialize sandbox manager for E2B-specific tools only
         self.sandbox_manager = create_sandbox_manager(session_id=self.session_id)
@@ -604,50 +895,19 @@ class AppBuilderAgent:
         logger.info(f"[{self.session_id}] Sandbox initialized, allocated port: {self.sandbox_manager._allocated_port}")
 
         # Create minimal MCP server with only E2B-specific tools
+        from .tools.sandbox_tools import create_e2b_only_server
         self.mcp_server = create_e2b_only_server(self.sandbox_manager, session_id=self.session_id)
 
         # Configure Claude Agent SDK with native tools and subagents
-        options = ClaudeAgentOptions(
+        options = dataclasses.replace(
+            build_agent_options(),
             # Set working directory to sandbox path - native tools will operate here
-            cwd=str(self._sandbox_path),
-
-            # Use Claude Code preset with our app builder additions
-            system_prompt={
-                "type": "preset",
-                "preset": "claude_code",
-                "append": SYSTEM_PROMPT_APPEND,
-            },
-
+            cwd=str(sandbox_path),
             model=model,
-
-            # Native tools + E2B MCP tools + Task for subagents
-            allowed_tools=[
-                # Native Claude Code tools
-                "Read", "Write", "Edit",
-                "Bash",
-                "Glob", "Grep",
-                "Task",  # For spawning subagents
-                # E2B-specific MCP tools (note: includes 'sandbox_' prefix from tool function names)
-                "mcp__e2b__sandbox_get_preview_url",
-                "mcp__e2b__sandbox_start_dev_server",
-            ],
-
             # E2B MCP server for preview URL and dev server
             mcp_servers={
                 "e2b": self.mcp_server
             },
-
-            # Specialized subagents for code review, error fixing, and component generation
-            agents=AGENTS,
-
-            # Hooks for self-correction and logging
-            hooks=HOOKS,
-
-            # Permission callback for dynamic tool access control
-            can_use_tool=permission_callback,
-
-            # Accept edits automatically for faster workflow
-            permission_mode="acceptEdits",
         )
 
         # Create and connect client
@@ -661,25 +921,16 @@ class AppBuilderAgent:
         self.sandbox_manager = create_sandbox_manager(session_id=self.session_id)
 
         # Create full MCP tools server for E2B operations
+        from .tools.sandbox_tools import create_sandbox_tools_server
         self.mcp_server = create_sandbox_tools_server(self.sandbox_manager, session_id=self.session_id)
 
         # Configure Claude Agent SDK with MCP tools (legacy approach)
-        options = ClaudeAgentOptions(
-            system_prompt=LEGACY_SYSTEM_PROMPT,
+        options = dataclasses.replace(
+            build_legacy_agent_options(),
             model=model,
             mcp_servers={
                 "sandbox": self.mcp_server
             },
-            allowed_tools=[
-                "mcp__sandbox__sandbox_write_file",
-                "mcp__sandbox__sandbox_read_file",
-                "mcp__sandbox__sandbox_list_files",
-                "mcp__sandbox__sandbox_run_command",
-                "mcp__sandbox__sandbox_install_packages",
-                "mcp__sandbox__sandbox_get_preview_url",
-                "mcp__sandbox__sandbox_start_dev_server",
-            ],
-            permission_mode="acceptEdits",
         )
 
         # Create and connect client
@@ -710,97 +961,83 @@ class AppBuilderAgent:
             )
 
         # Generate message ID for tracking
-        msg_id = f"req_{int(time.time()*1000)}"
+        msg_id = f"req_{time.time_ns()}"
         self.slogger.log_agent("CHAT_START", f"msg_id={msg_id}, len={len(message)}")
-        logger.info(f"[{self.session_id}] Processing chat message: {message[:100]}{'...' if len(message) > 100 else ''}")
+        # %.100s truncates only if the record is actually emitted
+        logger.info(
+            "[%s] Processing chat message: %.100s%s",
+            self.session_id, message, "..." if len(message) > 100 else "",
+        )
+
+        # Bind attributes used on every block to locals
+        client = self.client
+        block_handlers = self._block_handlers
+        emit = self._emit
+        assistant_message_type = AssistantMessage
+        sandbox_notified = self._sandbox_notified
+
+        # Greetings/thanks go to the simple model (if configured); everything
+        # else runs on the main model. Switch only when the model changes.
+        turn_model = self._model
+        if self._simple_model and _is_simple_message(message):
+            turn_model = self._simple_model
+        if turn_model != self._active_model:
+            await client.set_model(turn_model)
+            self._active_model = turn_model
+            self.slogger.log_agent("MODEL_SWITCH", f"msg_id={msg_id}, model={turn_model}")
 
         # Send message to Claude
-        await self.client.query(message)
+        await client.query(message)
 
-        # Track if we've started a dev server to get preview URL
-        preview_url = None
+        # Per-turn state shared with the block handlers
+        self._preview_url = None
+        self._preview_url_tool_ids.clear()
+        self._after_tool_block = False
 
-        # Track blocks for summary logging
-        text_block_count = 0
-        tool_use_count = 0
-        tool_result_count = 0
+        # Track blocks for summary logging (keyed by event type)
+        block_counts = {"text": 0, "tool_use": 0, "tool_result": 0}
 
         # Stream response from Claude
-        last_block_type = None
-        async for msg in self.client.receive_response():
-            if isinstance(msg, AssistantMessage):
+        async for msg in client.receive_response():
+            if isinstance(msg, assistant_message_type):
+                # Consecutive text blocks of one message are already in hand,
+                # so they go out as a single text event
+                text_parts: list[str] = []
+
                 # Process message content blocks
                 for block in msg.content:
-                    if isinstance(block, TextBlock):
-                        # Add separator if coming after tool use/result for visual break
-                        text = block.text
-                        if last_block_type in ('tool_result', 'tool_use'):
-                            text = "\n\n---\n\n" + text
-
-                        # Log text block
-                        self.slogger.log_agent("TEXT_BLOCK", f"len={len(block.text)}")
-                        text_block_count += 1
-
-                        event = {
-                            "type": "text",
-                            "content": text
-                        }
-                        if self.on_event:
-                            self.on_event(event)
-                        yield event
-                        last_block_type = 'text'
-
-                    elif isinstance(block, ToolUseBlock):
-                        # Check if sandbox was created (lazy init) and notify
-                        if not self._sandbox_notified and self.sandbox_manager and self.sandbox_manager.is_initialized:
-                            self._sandbox_notified = True
-                            sandbox_event = {
-                                "type": "sandbox_ready",
-                                "sandbox_id": self.sandbox_manager.sandbox_id
-                            }
-                            if self.on_event:
-                                self.on_event(sandbox_event)
-                            yield sandbox_event
-
-                        # Log tool use block with detailed input info
-                        input_keys = list(block.input.keys()) if isinstance(block.input, dict) else str(type(block.input))
-                        self.slogger.log_agent("TOOL_USE_BLOCK", f"tool={block.name}, id={block.id}, input_keys={input_keys}")
-                        tool_use_count += 1
-
-                        # Debug logging for Write tool
-                        if block.name == "Write":
-                            logger.info(f"[{self.session_id}] Write tool input: {list(block.input.keys()) if isinstance(block.input, dict) else block.input}")
-
-                        event = {
-                            "type": "tool_use",
-                            "tool": block.name,
-                            "input": block.input
-                        }
-                        if self.on_event:
-                            self.on_event(event)
-                        yield event
-                        last_block_type = 'tool_use'
-
-                    elif isinstance(block, ToolResultBlock):
-                        # Log tool result block
-                        content_type = type(block.content).__name__
-                        content_preview = str(block.content)[:200] if block.content else "None"
-                        self.slogger.log_agent("TOOL_RESULT_BLOCK", f"id={block.tool_use_id}, content_type={content_type}")
-                        tool_result_count += 1
-
-                        event = {
-                            "type": "tool_result",
-                            "tool": block.tool_use_id,
-                            "result": block.content
-                        }
-                        if self.on_event:
-                            self.on_event(event)
-                        yield event
-                        last_block_type = 'tool_result'
-
-                        # Extract preview URL if available
-                        content = block.content
-                        preview_url = self._extract_preview_url(content) or preview_url
+                    handler = block_handlers.get(type(block)) or self._find_block_handler(block)
+                    if handler is None:
+                        continue
+
+                    event = handler(block)
+                    event_type = event["type"]
+                    block_counts[event_type] += 1
+
+                    if event_type == "text":
+                        text_parts.append(event["content"])
+                        continue
+
+                    if text_parts:
+                        yield emit({"type": "text", "content": "".join(text_parts)})
+                        text_parts.clear()
+
+                    # Check if sandbox was created (lazy init) and notify
+                    if not sandbox_notified and event_type == "tool_use":
+                        sandbox_event = self._sandbox_ready_event()
+                        if sandbox_event:
+                            sandbox_notified = True
+                            yield emit(sandbox_event)
+
+                    yield emit(event)
+
+                if text_parts:
+                    yield emit({"type": "text", "content": "".join(text_parts)})
+
+            elif isinstance(msg, ResultMessage):
+                self._log_usage(msg_id, msg)
+
+        preview_url = self._preview_url
 
         # If we didn't get preview URL from tool results, try sandbox manager
         if not preview_url and self.sandbox_manager:
@@ -810,55 +1047,196 @@ class AppBuilderAgent:
                 self.slogger.log_agent("PREVIEW_URL_FOUND", f"source=sandbox_manager, url={preview_url}")
 
         # Send done event with preview URL if available
-        done_event = {
+        done_event = emit({
             "type": "done",
             "preview_url": preview_url
-        }
-        if self.on_event:
-            self.on_event(done_event)
+        })
 
         # Log chat completion
         self.slogger.log_agent(
             "CHAT_END",
-            f"msg_id={msg_id}, text_blocks={text_block_count}, "
-            f"tool_uses={tool_use_count}, tool_results={tool_result_count}, "
+            f"msg_id={msg_id}, text_blocks={block_counts['text']}, "
+            f"tool_uses={block_counts['tool_use']}, tool_results={block_counts['tool_result']}, "
             f"preview_url={preview_url}"
         )
-        logger.info(f"[{self.session_id}] Chat completed, preview_url={preview_url}")
+        logger.info("[%s] Chat completed, preview_url=%s", self.session_id, preview_url)
         yield done_event
 
+    def _log_usage(self, msg_id: str, result: ResultMessage) -> None:
+        """Log token usage for a turn, including prompt cache hits."""
+        usage = result.usage
+        if not usage:
+            return
+        self.slogger.log_agent(
+            "USAGE",
+            f"msg_id={msg_id}, input={usage.get('input_tokens', 0)}, "
+            f"cache_read={usage.get('cache_read_input_tokens', 0)}, "
+            f"cache_write={usage.get('cache_creation_input_tokens', 0)}, "
+            f"output={usage.get('output_tokens', 0)}"
+        )
+
+    def _emit(self, event: dict) -> dict:
+        """Forward an event to the on_event callback (if any) and return it."""
+        if self.on_event:
+            result = self.on_event(event)
+            if inspect.isawaitable(result):
+                self._queue_event_callback(result)
+        return event
+
+    def _queue_event_callback(self, awaitable: Awaitable) -> None:
+        """Hand an async on_event result to the drain task (started on first use)."""
+        if self._event_queue is None:
+            self._event_queue = asyncio.Queue()
+            self._drain_task = asyncio.create_task(self._drain_events())
+        self._event_queue.put_nowait(awaitable)
+
+    async def _drain_events(self) -> None:
+        """Await queued async on_event callbacks in emission order."""
+        while True:
+            awaitable = await self._event_queue.get()
+            try:
+                await awaitable
+            except Exception as e:
+                logger.error(f"[{self.session_id}] on_event callback failed: {e}", exc_info=True)
+            finally:
+                self._event_queue.task_done()
+
+    def _find_block_handler(self, block) -> Optional[Callable[[Any], dict]]:
+        """Fallback lookup for block subclasses not keyed in _block_handlers."""
+        for block_type, handler in self._block_handlers.items():
+            if isinstance(block, block_type):
+                return handler
+        return None
+
+    def _sandbox_ready_event(self) -> Optional[dict]:
+        """Return a one-time sandbox_ready event once the sandbox exists."""
+        if self.sandbox_manager and self.sandbox_manager.is_initialized:
+            self._sandbox_notified = True
+            return {
+                "type": "sandbox_ready",
+                "sandbox_id": self.sandbox_manager.sandbox_id
+            }
+        return None
+
+    def _handle_text_block(self, block: TextBlock) -> dict:
+        """Build a text event, separating it from preceding tool activity."""
+        # Add separator if coming after tool use/result for visual break
+        text = block.text
+        if self._after_tool_block:
+            text = "\n\n---\n\n" + text
+            self._after_tool_block = False
+
+        # Log text block
+        self.slogger.log_agent("TEXT_BLOCK", f"len={len(block.text)}")
+
+        return {
+            "type": "text",
+            "content": text
+        }
+
+    def _handle_tool_use_block(self, block: ToolUseBlock) -> dict:
+        """Build a tool_use event."""
+        # Log tool use block with detailed input info
+        input_keys = ",".join(block.input) if isinstance(block.input, dict) else type(block.input).__name__
+        self.slogger.log_agent("TOOL_USE_BLOCK", f"tool={block.name}, id={block.id}, input_keys=[{input_keys}]")
+        self._after_tool_block = True
+
+        # Only results of these tools are probed for a preview URL
+        if block.name in PREVIEW_URL_TOOLS:
+            self._preview_url_tool_ids.add(block.id)
+
+        # Debug logging for Write tool
+        if block.name == TOOL_WRITE and logger.isEnabledFor(logging.INFO):
+            logger.info(
+                "[%s] Write tool input: %s",
+                self.session_id,
+                list(block.input) if isinstance(block.input, dict) else block.input,
+            )
+
+        return {
+            "type": "tool_use",
+            "tool": block.name,
+            "input": block.input
+        }
+
+    def _handle_tool_result_block(self, block: ToolResultBlock) -> dict:
+        """Build a tool_result event and pick up any preview URL it carries."""
+        # Log tool result block
+        content_type = type(block.content).__name__
+        self.slogger.log_agent("TOOL_RESULT_BLOCK", f"id={block.tool_use_id}, content_type={content_type}")
+        self._after_tool_block = True
+
+        # Extract preview URL if this is the result of a preview/dev-server call
+        if block.tool_use_id in self._preview_url_tool_ids:
+            self._preview_url_tool_ids.discard(block.tool_use_id)
+            self._preview_url = self._extract_preview_url(block.content) or self._preview_url
+
+        return {
+            "type": "tool_result",
+            "tool": block.tool_use_id,
+            "result": block.content
+        }
+
     def _extract_preview_url(self, content) -> Optional[str]:
         """Extract preview URL from tool result content."""
-        # Handle dict content
-        if isinstance(content, dict):
-            if "preview_url" in content:
-                return content["preview_url"]
-            elif "url" in content:
-                return content["url"]
-
-        # Handle list content
-        elif isinstance(content, list):
+        if not content:
+            return None
+
+        # Tool result content is always a plain built-in (decoded JSON), so
+        # exact type checks are enough
+        content_type = type(content)
+
+        # Dict content (MCP tool return shape) - most common, check first
+        if content_type is dict:
+            return content.get("preview_url") or content.get("url")
+
+        # List content - return on the first item that carries a URL
+        if content_type is list or content_type is tuple:
             for item in content:
-                if isinstance(item, dict):
-                    if "preview_url" in item:
-                        return item["preview_url"]
-                    elif "url" in item:
-                        return item["url"]
-                    elif "text" in item and isinstance(item["text"], str):
-                        text = item["text"]
-                        if "http://localhost:" in text:
-                            match = re.search(r'http://localhost:\d+', text)
-                            if match:
-                                return match.group(0)
-
-        # Handle string content
-        elif isinstance(content, str) and "http://localhost:" in content:
-            match = re.search(r'http://localhost:\d+', content)
-            if match:
-                return match.group(0)
+                if type(item) is dict:
+                    url = item.get("preview_url") or item.get("url")
+                    if url:
+                        return url
+                    text = item.get("text")
+                    if type(text) is str:
+                        url = _find_localhost_url(text)
+                        if url:
+                            return url
+            return None
+
+        # String content
+        if content_type is str:
+            return _find_localhost_url(content)
 
         return None
 
+    async def interrupt(self) -> None:
+        """
+        Stop the turn Claude is currently running (best effort).
+
+        Used when the caller gives up on a chat() stream (e.g. on timeout).
+        client.interrupt() only sends the request; the rest of the turn, up
+        to its ResultMessage, is still buffered and would otherwise be read
+        by the next chat(). It is drained here so the next query starts clean.
+        """
+        if not self.client:
+            return
+        try:
+            await self.client.interrupt()
+            drained = 0
+            async with asyncio.timeout(INTERRUPT_DRAIN_TIMEOUT):
+                async for _ in self.client.receive_response():
+                    drained += 1
+            self.slogger.log_agent("INTERRUPT", f"in-flight turn interrupted, drained={drained}")
+            logger.info(f"[{self.session_id}] Interrupted in-flight turn")
+        except TimeoutError:
+            logger.warning(
+                f"[{self.session_id}] Interrupted turn did not finish within "
+                f"{INTERRUPT_DRAIN_TIMEOUT}s; next response may include stale messages"
+            )
+        except Exception as e:
+            logger.warning(f"[{self.session_id}] Failed to interrupt turn: {e}")
+
     async def cleanup(self) -> None:
         """
         Cleanup resources (close MCP server, cleanup sandboxes, etc.)
@@ -866,24 +1244,47 @@ class AppBuilderAgent:
         """
         logger.info(f"[{self.session_id}] Cleaning up agent resources...")
         try:
-            # Disconnect Claude SDK client
+            # Deliver pending async on_event callbacks (e.g. the final done),
+            # then stop the drain task; whatever misses the deadline is dropped
+            if self._drain_task:
+                try:
+                    async with asyncio.timeout(EVENT_FLUSH_TIMEOUT):
+                        await self._event_queue.join()
+                except TimeoutError:
+                    logger.warning(
+                        f"[{self.session_id}] Dropping {self._event_queue.qsize()} on_event "
+                        f"callbacks not delivered within {EVENT_FLUSH_TIMEOUT}s"
+                    )
+                self._drain_task.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await self._drain_task
+                while not self._event_queue.empty():
+                    pending = self._event_queue.get_nowait()
+                    if inspect.iscoroutine(pending):
+                        pending.close()
+                self._drain_task = None
+                self._event_queue = None
+
+            # Client, sandbox and MCP server teardowns are independent;
+            # run them concurrently so one slow teardown doesn't delay the rest
+            teardowns: dict[str, Awaitable] = {}
             if self.client:
-                await self.client.disconnect()
-                self.client = None
-                logger.debug(f"[{self.session_id}] Claude SDK client disconnected")
-
-            # Cleanup sandbox manager
+                teardowns["Claude SDK client"] = self.client.disconnect()
             if self.sandbox_manager:
-                await self.sandbox_manager.destroy()
-                self.sandbox_manager = None
-                logger.debug(f"[{self.session_id}] Sandbox manager destroyed")
-
-            # Close MCP server
-            if self.mcp_server:
-                if hasattr(self.mcp_server, 'close'):
-                    await self.mcp_server.close()
-                self.mcp_server = None
-                logger.debug(f"[{self.session_id}] MCP server closed")
+                teardowns["sandbox manager"] = self.sandbox_manager.destroy()
+            if self.mcp_server and hasattr(self.mcp_server, 'close'):
+                teardowns["MCP server"] = self.mcp_server.close()
+
+            results = await asyncio.gather(*teardowns.values(), return_exceptions=True)
+            for name, result in zip(teardowns, results):
+                if isinstance(result, BaseException):
+                    logger.error(f"[{self.session_id}] Error closing {name}: {result}", exc_info=result)
+                else:
+                    logger.debug(f"[{self.session_id}] {name} closed")
+
+            self.client = None
+            self.sandbox_manager = None
+            self.mcp_server = None
 
             self._initialized = False
             logger.info(f"[{self.session_id}] Agent cleanup completed")
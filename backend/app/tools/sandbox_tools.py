@@ -5,10 +5,12 @@ Provides tools for interacting with E2B sandboxes through the Claude Agent SDK M
 These tools allow Claude to manage files, run commands, and interact with sandboxes.
 """
 
+import functools
 import logging
 import time
 import traceback
 from contextvars import ContextVar
+from pathlib import Path
 from typing import Any, Optional
 
 from claude_agent_sdk import tool, create_sdk_mcp_server
@@ -22,6 +24,9 @@ logger = logging.getLogger(__name__)
 _sandbox_manager: ContextVar[Optional[Any]] = ContextVar('sandbox_manager', default=None)
 _session_id: ContextVar[Optional[str]] = ContextVar('session_id', default=None)
 
+# Detailed guidelines kept out of the system prompt, served on demand
+GUIDELINES_DIR = Path(__file__).parent.parent / "prompts" / "guidelines"
+
 
 def set_sandbox_manager(manager):
     """Set the sandbox manager for the current session context."""
@@ -690,6 +695,54 @@ async def sandbox_start_dev_server(args: dict[str, Any]) -> dict[str, Any]:
         }
 
 
+@functools.cache
+def get_guideline_sections() -> tuple[str, ...]:
+    """Names of the available guideline sections (file stems in GUIDELINES_DIR)."""
+    return tuple(sorted(path.stem for path in GUIDELINES_DIR.glob("*.md")))
+
+
+@functools.cache
+def load_guideline(section: str) -> str:
+    """Read one guideline section (cached for the process)."""
+    return (GUIDELINES_DIR / f"{section}.md").read_text(encoding="utf-8")
+
+
+@tool(
+    "sandbox_read_guidelines",
+    f"Read a detailed app-building guideline section. Sections: {', '.join(get_guideline_sections())}.",
+    {"section": str}
+)
+async def sandbox_read_guidelines(args: dict[str, Any]) -> dict[str, Any]:
+    """
+    Return the text of a guideline section.
+
+    Args:
+        section: Section name (file stem under prompts/guidelines)
+
+    Returns:
+        The guideline markdown, or the list of valid sections
+    """
+    section = args.get("section", "")
+    sections = get_guideline_sections()
+    logger.info(f"[TOOL] sandbox_read_guidelines called: section={section}")
+
+    if section not in sections:
+        return {
+            "content": [{
+                "type": "text",
+                "text": f"Unknown guideline section: {section!r}. Available: {', '.join(sections)}"
+            }],
+            "isError": True
+        }
+
+    return {
+        "content": [{
+            "type": "text",
+            "text": load_guideline(section)
+        }]
+    }
+
+
 def create_sandbox_tools_server(sandbox_manager, session_id: str = None):
     """
     Create an MCP server with ALL E2B sandbox tools (legacy, for E2B cloud mode).
@@ -727,6 +780,8 @@ def create_e2b_only_server(sandbox_manager, session_id: str = None):
     This server only provides tools that native Claude Code tools cannot handle:
     - get_preview_url: Returns the correct localhost URL
     - start_dev_server: Starts the Next.js dev server in background
+    - read_guidelines: Serves the detailed guidelines trimmed from the system prompt
+      (LOCAL only: they describe the native-tool workflow)
 
     File operations (Read, Write, Edit, Bash, Glob, Grep) are handled by native tools.
 
@@ -747,5 +802,6 @@ def create_e2b_only_server(sandbox_manager, session_id: str = None):
         tools=[
             sandbox_get_preview_url,
             sandbox_start_dev_server,
+            sandbox_read_guidelines,
         ]
     )
@@ -196,6 +196,8 @@ class ConnectionManager:
                             await self.send_message(session_id, event)
                 except asyncio.TimeoutError:
                     logger.error(f"[{session_id}] Agent response timed out after {AGENT_RESPONSE_TIMEOUT}s")
+                    # Stop the abandoned turn so it doesn't keep the sandbox busy
+                    await agent.interrupt()
                     await self.send_message(session_id, {
                         "type": "error",
                         "message": f"Response timed out after {AGENT_RESPONSE_TIMEOUT} seconds"
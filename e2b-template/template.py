@@ -25,20 +25,38 @@ STREAMLIT_PACKAGES = [
     "pydantic",
 ]
 
+# Packages run_streamlit.py may detect but that aren't pre-installed.
+# Their wheels are pre-downloaded into the uv cache so sandboxes install
+# them by symlinking from the cache instead of downloading.
+CACHED_PACKAGES = [
+    "seaborn",
+    "scikit-learn",
+    "scipy",
+    "bokeh",
+]
+
+UV = "/home/user/.local/bin/uv"
+UV_CACHE_DIR = "/home/user/.cache/uv"
+
 template = (
     Template()
     .from_image("e2bdev/base")
     # Install uv (fast Python package manager)
     .run_cmd("curl -LsSf https://astral.sh/uv/install.sh | sh")
     # Install Python 3.12
-    .run_cmd("/home/user/.local/bin/uv python install 3.12")
+    .run_cmd(f"{UV} python install 3.12")
     # Create venv with Python 3.12
-    .run_cmd("/home/user/.local/bin/uv venv /home/user/.venv --python 3.12")
+    .run_cmd(f"{UV} venv /home/user/.venv --python 3.12")
     # Install all Streamlit packages
     .run_cmd(
-        "/home/user/.local/bin/uv pip install --python /home/user/.venv/bin/python "
+        f"{UV} pip install --python /home/user/.venv/bin/python --cache-dir {UV_CACHE_DIR} "
         + " ".join(STREAMLIT_PACKAGES)
     )
+    # Warm the uv cache with optional packages (throwaway target dir)
+    .run_cmd(
+        f"{UV} pip install --python /home/user/.venv/bin/python --cache-dir {UV_CACHE_DIR} "
+        f"--target /tmp/uv-warm {' '.join(CACHED_PACKAGES)} && rm -rf /tmp/uv-warm"
+    )
     # Add venv to PATH so streamlit command works directly
     .set_envs({"PATH": "/home/user/.venv/bin:/home/user/.local/bin:$PATH"})
 )
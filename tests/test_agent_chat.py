@@ -0,0 +1,324 @@
+"""
+Tests for AppBuilderAgent.chat() event streaming.
+"""
+
+import asyncio
+import collections
+import pytest
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+# Add backend to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+from claude_agent_sdk import AssistantMessage, ResultMessage, TextBlock, ToolResultBlock, ToolUseBlock
+
+from app import agent as agent_module
+from app import logging_config
+from app.agent import AppBuilderAgent, _is_simple_message
+
+SESSION_ID = "test-agent-chat"
+
+
+class FakeClient:
+    """Stands in for ClaudeSDKClient: one message stream shared by all turns."""
+
+    def __init__(self):
+        self.pending = collections.deque()
+        self.queries = []
+        self.models = []
+        self.interrupted = False
+
+    async def query(self, message):
+        self.queries.append(message)
+
+    async def set_model(self, model):
+        self.models.append(model)
+
+    async def interrupt(self):
+        self.interrupted = True
+
+    async def disconnect(self):
+        pass
+
+    async def receive_response(self):
+        # Like the SDK: yield buffered messages up to and including a ResultMessage
+        while self.pending:
+            msg = self.pending.popleft()
+            yield msg
+            if isinstance(msg, ResultMessage):
+                return
+
+
+def _assistant(*blocks):
+    return AssistantMessage(content=list(blocks), model="test-model")
+
+
+def _result():
+    return ResultMessage(
+        subtype="success",
+        duration_ms=1,
+        duration_api_ms=1,
+        is_error=False,
+        num_turns=1,
+        session_id=SESSION_ID,
+    )
+
+
+@pytest.fixture
+def agent(tmp_path, monkeypatch):
+    """Initialized agent wired to a FakeClient, logging into tmp_path."""
+    monkeypatch.setattr(logging_config, "LOGS_BASE_DIR", tmp_path)
+    agent = AppBuilderAgent(session_id=SESSION_ID)
+    agent.client = FakeClient()
+    agent._initialized = True
+    yield agent
+    logging_config.close_session_logger(SESSION_ID)
+
+
+class TestInterrupt:
+    """Test abandoning a turn and interrupting it."""
+
+    @pytest.mark.asyncio
+    async def test_next_chat_skips_interrupted_turn(self, agent):
+        """Should drain the rest of the interrupted turn so it can't leak into the next one"""
+        client = agent.client
+        client.pending.extend([
+            _assistant(TextBlock("old 1")),
+            _assistant(TextBlock("old 2")),
+            _result(),
+        ])
+
+        stream = agent.chat("first")
+        assert (await anext(stream))["content"] == "old 1"
+        await stream.aclose()  # caller gave up, e.g. on timeout
+
+        await agent.interrupt()
+        assert client.interrupted
+
+        client.pending.extend([_assistant(TextBlock("new")), _result()])
+        events = [event async for event in agent.chat("second")]
+        assert events == [
+            {"type": "text", "content": "new"},
+            {"type": "done", "preview_url": None},
+        ]
+
+    @pytest.mark.asyncio
+    async def test_drain_gives_up_after_timeout(self, agent, monkeypatch):
+        """Should not hang if the interrupted turn never finishes"""
+        monkeypatch.setattr(agent_module, "INTERRUPT_DRAIN_TIMEOUT", 0.01)
+
+        async def never_finishes():
+            await asyncio.Event().wait()
+            yield
+
+        agent.client.receive_response = never_finishes
+        await agent.interrupt()
+        assert agent.client.interrupted
+
+
+class TestAsyncOnEvent:
+    """Test delivery of async on_event callbacks."""
+
+    @staticmethod
+    def _queue_turn(client):
+        client.pending.extend([
+            _assistant(
+                TextBlock("hi"),
+                ToolUseBlock(id="t1", name="Write", input={"file_path": "a.ts"}),
+                ToolResultBlock(tool_use_id="t1", content="ok"),
+            ),
+            _result(),
+        ])
+
+    @pytest.mark.asyncio
+    async def test_events_delivered_in_order(self, agent):
+        """Should deliver every event to an async callback in emission order, including done"""
+        delivered = []
+
+        async def on_event(event):
+            await asyncio.sleep(0.001)
+            delivered.append(event["type"])
+
+        agent.on_event = on_event
+        self._queue_turn(agent.client)
+        yielded = [event["type"] async for event in agent.chat("build")]
+        await agent.cleanup()
+
+        assert yielded == ["text", "tool_use", "tool_result", "done"]
+        assert delivered == yielded
+
+    @pytest.mark.asyncio
+    async def test_chat_does_not_wait_for_slow_callback(self, agent):
+        """Should finish streaming while callbacks are still blocked"""
+        release = asyncio.Event()
+        delivered = []
+
+        async def on_event(event):
+            await release.wait()
+            delivered.append(event["type"])
+
+        agent.on_event = on_event
+        self._queue_turn(agent.client)
+        yielded = [event["type"] async for event in agent.chat("build")]
+        assert yielded[-1] == "done"
+        assert delivered == []
+
+        release.set()
+        await agent.cleanup()
+        assert delivered == yielded
+
+    @pytest.mark.asyncio
+    async def test_cleanup_drops_callbacks_after_timeout(self, agent, monkeypatch):
+        """Should not let a stuck callback block cleanup"""
+        monkeypatch.setattr(agent_module, "EVENT_FLUSH_TIMEOUT", 0.01)
+
+        async def on_event(event):
+            await asyncio.Event().wait()
+
+        agent.on_event = on_event
+        self._queue_turn(agent.client)
+        [event async for event in agent.chat("build")]
+        await agent.cleanup()
+        assert agent._drain_task is None
+
+
+class TestTextCoalescing:
+    """Test merging of text blocks into text events."""
+
+    @pytest.mark.asyncio
+    async def test_consecutive_text_blocks_merge(self, agent):
+        """Should send consecutive text blocks of one message as a single event"""
+        agent.client.pending.extend([
+            _assistant(TextBlock("Hello"), TextBlock(", world")),
+            _result(),
+        ])
+        events = [event async for event in agent.chat("hi")]
+        assert events == [
+            {"type": "text", "content": "Hello, world"},
+            {"type": "done", "preview_url": None},
+        ]
+
+    @pytest.mark.asyncio
+    async def test_separator_after_tool_blocks(self, agent):
+        """Should flush text before a tool block and prefix the following text with a separator"""
+        agent.client.pending.extend([
+            _assistant(
+                TextBlock("Writing file"),
+                ToolUseBlock(id="t1", name="Write", input={"file_path": "a.ts"}),
+                ToolResultBlock(tool_use_id="t1", content="ok"),
+                TextBlock("Done"),
+                TextBlock(" writing"),
+            ),
+            _result(),
+        ])
+        events = [event async for event in agent.chat("build")]
+        assert [event["type"] for event in events] == ["text", "tool_use", "tool_result", "text", "done"]
+        assert events[0]["content"] == "Writing file"
+        assert events[3]["content"] == "\n\n---\n\nDone writing"
+
+    @pytest.mark.asyncio
+    async def test_separate_messages_are_not_merged(self, agent):
+        """Should keep text from different messages in separate events"""
+        agent.client.pending.extend([
+            _assistant(TextBlock("one")),
+            _assistant(TextBlock("two")),
+            _result(),
+        ])
+        events = [event async for event in agent.chat("hi")]
+        assert [event.get("content") for event in events] == ["one", "two", None]
+
+
+class TestPreviewUrl:
+    """Test picking the preview URL out of tool results."""
+
+    @staticmethod
+    def _tool_turn(client, name, content):
+        client.pending.extend([
+            _assistant(
+                ToolUseBlock(id="t1", name=name, input={}),
+                ToolResultBlock(tool_use_id="t1", content=content),
+            ),
+            _result(),
+        ])
+
+    @pytest.mark.asyncio
+    async def test_url_from_dev_server_result(self, agent):
+        """Should take the URL from a start_dev_server result"""
+        self._tool_turn(
+            agent.client,
+            "mcp__e2b__sandbox_start_dev_server",
+            [{"type": "text", "text": "Dev server running at http://localhost:3001"}],
+        )
+        events = [event async for event in agent.chat("run it")]
+        assert events[-1] == {"type": "done", "preview_url": "http://localhost:3001"}
+
+    @pytest.mark.asyncio
+    async def test_url_from_get_preview_url_result(self, agent):
+        """Should take the URL from a get_preview_url dict result (legacy server name)"""
+        self._tool_turn(
+            agent.client,
+            "mcp__sandbox__sandbox_get_preview_url",
+            {"preview_url": "https://3001-sandbox.e2b.dev"},
+        )
+        events = [event async for event in agent.chat("url?")]
+        assert events[-1]["preview_url"] == "https://3001-sandbox.e2b.dev"
+
+    @pytest.mark.asyncio
+    async def test_other_tool_results_are_ignored(self, agent):
+        """Should not report a localhost URL printed by an unrelated tool"""
+        self._tool_turn(agent.client, "Bash", "Server listening on http://localhost:3000")
+        events = [event async for event in agent.chat("run")]
+        assert events[-1]["preview_url"] is None
+
+    @pytest.mark.asyncio
+    async def test_falls_back_to_sandbox_manager(self, agent):
+        """Should use the sandbox manager's URL when no tool reported one"""
+        agent.sandbox_manager = SimpleNamespace(
+            preview_url="http://localhost:3002", is_initialized=False, sandbox_id=None
+        )
+        self._tool_turn(agent.client, "Bash", "Server listening on http://localhost:3000")
+        events = [event async for event in agent.chat("run")]
+        assert events[-1]["preview_url"] == "http://localhost:3002"
+
+
+class TestModelRouting:
+    """Test routing small talk to CLAUDE_SIMPLE_MODEL."""
+
+    @staticmethod
+    async def _chat(agent, message):
+        agent.client.pending.extend([_assistant(TextBlock("ok")), _result()])
+        return [event async for event in agent.chat(message)]
+
+    @pytest.mark.parametrize("message", ["hi", "Hello there!", "thanks", "Thank you.", "good morning"])
+    def test_simple_messages(self, message):
+        """Should treat whole-message greetings and thanks as simple"""
+        assert _is_simple_message(message)
+
+    @pytest.mark.parametrize("message", ["thanks, now add a chart", "yes", "ok", "hi, build me a dashboard"])
+    def test_non_simple_messages(self, message):
+        """Should keep anything with a request or confirmation on the main model"""
+        assert not _is_simple_message(message)
+
+    @pytest.mark.asyncio
+    async def test_no_switch_without_simple_model(self, agent):
+        """Should never call set_model when CLAUDE_SIMPLE_MODEL is unset"""
+        agent._model = agent._active_model = "main-model"
+        await self._chat(agent, "hi")
+        assert agent.client.models == []
+
+    @pytest.mark.asyncio
+    async def test_switches_only_when_model_changes(self, agent):
+        """Should switch to the simple model for small talk and back for real requests"""
+        agent._model = agent._active_model = "main-model"
+        agent._simple_model = "simple-model"
+
+        await self._chat(agent, "hi")
+        await self._chat(agent, "thanks!")
+        assert agent.client.models == ["simple-model"]
+
+        await self._chat(agent, "build a sales dashboard")
+        await self._chat(agent, "add a chart")
+        assert agent.client.models == ["simple-model", "main-model"]
+        assert agent._active_model == "main-model"
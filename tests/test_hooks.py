@@ -0,0 +1,111 @@
+"""
+Tests for the PreToolUse/PostToolUse hooks.
+"""
+
+import pytest
+import sys
+from pathlib import Path
+
+# Add backend to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+from app.agent import HookEvent, _as_event, log_tool_usage, validate_build_result
+
+
+class TestHookEvent:
+    """Test decoding of SDK hook input."""
+
+    def test_parses_fields(self):
+        """Should pull tool fields out of input_data"""
+        ev = _as_event({
+            "tool_name": "Bash",
+            "tool_input": {"command": "ls"},
+            "tool_response": {"exitCode": 0},
+            "session_id": "abc",
+        })
+        assert ev == HookEvent("Bash", {"command": "ls"}, {"exitCode": 0}, "abc")
+
+    def test_missing_fields_default(self):
+        """Should fall back to empty values for missing fields"""
+        ev = _as_event({})
+        assert ev.tool_name == "unknown"
+        assert ev.tool_input == {}
+        assert ev.tool_response == {}
+        assert ev.session_id is None
+
+
+class TestValidateBuildResult:
+    """Test build failure self-correction hook."""
+
+    @pytest.mark.asyncio
+    async def test_failed_build_adds_system_message(self):
+        """Should inject a system message when a build command fails"""
+        result = await validate_build_result(
+            {
+                "tool_name": "Bash",
+                "tool_input": {"command": "npm run build"},
+                "tool_response": {"exitCode": 1, "output": "Type error in page.tsx"},
+            },
+            None,
+            {}
+        )
+        assert "exit code 1" in result["systemMessage"]
+        assert "Type error in page.tsx" in result["systemMessage"]
+
+    @pytest.mark.asyncio
+    async def test_long_output_keeps_tail(self):
+        """Should keep the end of long build output, where errors are"""
+        output = "x" * 5000 + "error TS2304: Cannot find name"
+        result = await validate_build_result(
+            {
+                "tool_name": "Bash",
+                "tool_input": {"command": "npx tsc --noEmit"},
+                "tool_response": {"exitCode": 2, "output": output},
+            },
+            None,
+            {}
+        )
+        assert "error TS2304: Cannot find name" in result["systemMessage"]
+        assert "x" * 2001 not in result["systemMessage"]
+
+    @pytest.mark.asyncio
+    async def test_successful_build_is_ignored(self):
+        """Should do nothing when the build succeeds"""
+        result = await validate_build_result(
+            {
+                "tool_name": "Bash",
+                "tool_input": {"command": "npm run build"},
+                "tool_response": {"exitCode": 0},
+            },
+            None,
+            {}
+        )
+        assert result == {}
+
+    @pytest.mark.asyncio
+    async def test_non_build_failure_is_ignored(self):
+        """Should ignore failing commands that are not builds"""
+        result = await validate_build_result(
+            {
+                "tool_name": "Bash",
+                "tool_input": {"command": "ls missing-dir"},
+                "tool_response": {"exitCode": 2},
+            },
+            None,
+            {}
+        )
+        assert result == {}
+
+
+class TestLogToolUsage:
+    """Test tool call logging hook."""
+
+    @pytest.mark.asyncio
+    async def test_returns_empty(self):
+        """Should never alter the tool call"""
+        result = await log_tool_usage(
+            {"tool_name": "Write", "tool_input": {"content": "x" * 1000}},
+            None,
+            {}
+        )
+        assert result == {}
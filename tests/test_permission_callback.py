@@ -9,7 +9,7 @@ from pathlib import Path
 # Add backend to path
 sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
 
-from app.agent import permission_callback
+from app.agent import check_permission, permission_callback
 
 
 class TestDangerousBashCommands:
@@ -57,6 +57,16 @@ class TestDangerousBashCommands:
         assert result["behavior"] == "deny"
         assert "sudo" in result["message"].lower()
 
+    @pytest.mark.asyncio
+    async def test_blocks_uppercase_sudo(self):
+        """Should block sudo regardless of case"""
+        result = await permission_callback(
+            "Bash",
+            {"command": "SUDO apt-get install something"},
+            {}
+        )
+        assert result["behavior"] == "deny"
+
     @pytest.mark.asyncio
     async def test_blocks_fork_bomb(self):
         """Should block fork bomb."""
@@ -142,6 +152,121 @@ class TestDangerousBashCommands:
         assert result["behavior"] == "deny"
 
 
+class TestTokenizedBashCommands:
+    """Test dangerous commands that substring matching alone misses."""
+
+    @pytest.mark.asyncio
+    async def test_blocks_rm_rf_root_extra_spaces(self):
+        """Should block rm -rf / with irregular spacing"""
+        result = await permission_callback(
+            "Bash",
+            {"command": "rm  -rf   /"},
+            {}
+        )
+        assert result["behavior"] == "deny"
+
+    @pytest.mark.asyncio
+    async def test_blocks_rm_split_flags(self):
+        """Should block rm -r -f ~ with separated flags"""
+        result = await permission_callback(
+            "Bash",
+            {"command": "rm -r -f ~"},
+            {}
+        )
+        assert result["behavior"] == "deny"
+
+    @pytest.mark.asyncio
+    async def test_blocks_chained_sudo(self):
+        """Should block sudo after a shell operator"""
+        result = await permission_callback(
+            "Bash",
+            {"command": "npm install&&sudo\tnpm install -g pnpm"},
+            {}
+        )
+        assert result["behavior"] == "deny"
+        assert "sudo" in result["message"]
+
+    @pytest.mark.asyncio
+    async def test_blocks_path_qualified_sudo(self):
+        """Should block sudo invoked by path after env assignments"""
+        result = await permission_callback(
+            "Bash",
+            {"command": "DEBUG=1 /usr/bin/sudo ls"},
+            {}
+        )
+        assert result["behavior"] == "deny"
+
+    @pytest.mark.asyncio
+    async def test_blocks_dd_reordered_args(self):
+        """Should block dd regardless of argument order"""
+        result = await permission_callback(
+            "Bash",
+            {"command": "dd of=/dev/sda if=/dev/zero"},
+            {}
+        )
+        assert result["behavior"] == "deny"
+
+    @pytest.mark.asyncio
+    async def test_allows_chained_safe_commands(self):
+        """Should allow chained commands that are individually safe"""
+        result = await permission_callback(
+            "Bash",
+            {"command": "rm -rf node_modules && npm install; npm run build | tail -n 20"},
+            {}
+        )
+        assert result["behavior"] == "allow"
+
+    @pytest.mark.asyncio
+    async def test_allows_unbalanced_quotes(self):
+        """Should allow a command with an unterminated quote"""
+        result = await permission_callback(
+            "Bash",
+            {"command": "echo \"unterminated"},
+            {}
+        )
+        assert result["behavior"] == "allow"
+
+    @pytest.mark.asyncio
+    async def test_allows_operator_inside_quotes(self):
+        """Should not split sub-commands on operators inside quotes"""
+        result = await permission_callback(
+            "Bash",
+            {"command": "echo \"a | dd is fine\""},
+            {}
+        )
+        assert result["behavior"] == "allow"
+
+    @pytest.mark.asyncio
+    async def test_allows_multiline_inline_script(self):
+        """Should not split a quoted multi-line -c script on its newlines"""
+        result = await permission_callback(
+            "Bash",
+            {"command": "python -c \"import os\ndd = 1\nprint(dd)\""},
+            {}
+        )
+        assert result["behavior"] == "allow"
+
+    @pytest.mark.asyncio
+    async def test_allows_operator_in_unterminated_quote(self):
+        """Should not treat text after an operator inside an unterminated quote as a command"""
+        result = await permission_callback(
+            "Bash",
+            {"command": "git commit -m \"tidy up; dd handling"},
+            {}
+        )
+        assert result["behavior"] == "allow"
+
+    @pytest.mark.asyncio
+    async def test_blocks_before_unterminated_quote(self):
+        """Should still check the sub-commands before an unterminated quote"""
+        result = await permission_callback(
+            "Bash",
+            {"command": "npm install\nsudo ls; echo \"unterminated"},
+            {}
+        )
+        assert result["behavior"] == "deny"
+
+
 class TestAllowedBashCommands:
     """Test that safe commands are allowed."""
 
@@ -387,3 +512,29 @@ class TestOtherTools:
             {}
         )
         assert result["behavior"] == "allow"
+
+
+class TestCheckPermission:
+    """Test the synchronous permission core."""
+
+    def test_denies_dangerous_command(self):
+        """Should deny without needing an event loop"""
+        result = check_permission("Bash", {"command": "sudo ls"})
+        assert result["behavior"] == "deny"
+
+    def test_allows_unvalidated_tool(self):
+        """Should allow tools that have no validator"""
+        assert check_permission("Glob", {"pattern": "*"}) == {"behavior": "allow"}
+
+    def test_repeated_check_is_consistent(self):
+        """Should return the same verdict on cached repeat calls"""
+        first = check_permission("Bash", {"command": "sudo ls"})
+        second = check_permission("Bash", {"command": "sudo ls"})
+        assert first == second
+        assert first is not second
+
+    def test_long_command_is_checked(self):
+        """Should still check commands too long to cache"""
+        command = "echo " + "x" * 5000 + " && sudo ls"
+        result = check_permission("Bash", {"command": command})
+        assert result["behavior"] == "deny"
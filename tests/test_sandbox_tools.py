@@ -0,0 +1,44 @@
+"""
+Tests for the on-demand guideline tool in sandbox_tools.
+"""
+
+import pytest
+import sys
+from pathlib import Path
+
+# Add backend to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+from app.agent import SYSTEM_PROMPT_APPEND
+from app.tools.sandbox_tools import GUIDELINES_DIR, get_guideline_sections, sandbox_read_guidelines
+
+
+async def read_guidelines(section):
+    return await sandbox_read_guidelines.handler({"section": section})
+
+
+class TestReadGuidelines:
+    """Test sandbox_read_guidelines."""
+
+    @pytest.mark.asyncio
+    async def test_known_section_returns_text(self):
+        """Should return the markdown of an existing section"""
+        result = await read_guidelines("workflow")
+        assert not result.get("isError")
+        assert result["content"][0]["text"] == (GUIDELINES_DIR / "workflow.md").read_text(encoding="utf-8")
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("section", ["unknown", "../agents/code-reviewer", "", "workflow.md"])
+    async def test_unknown_section_is_error(self, section):
+        """Should reject sections that are not guideline files, including path traversal"""
+        result = await read_guidelines(section)
+        assert result["isError"] is True
+        assert "Unknown guideline section" in result["content"][0]["text"]
+
+    def test_sections_listed_from_directory(self):
+        """Should list every guideline file in the tool description and system prompt"""
+        sections = get_guideline_sections()
+        assert sections == tuple(sorted(path.stem for path in GUIDELINES_DIR.glob("*.md")))
+        for section in sections:
+            assert section in sandbox_read_guidelines.description
+            assert f"`{section}`" in SYSTEM_PROMPT_APPEND